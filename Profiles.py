@@ -1,136 +1,99 @@
 import streamlit as st
-import plotly.graph_objects as go
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import io
 import datetime # Added for timestamping
-import threading # IMPORTED: To handle simultaneous user submissions
-
-# --- GLOBAL LOCK for thread-safe Google Sheets writing ---
-# This ensures that only one user can write to the sheet at a time, preventing race conditions.
-_lock = threading.Lock()
+import hmac
+import json
+import uuid
+from scoring import SLIDER_VARS, CATEGORICAL_VARS, ALL_VARS, SEL_VARS, categorical_mappings, map_level
+from profile_codec import encode_profile, decode_profile, profile_for_code, to_token, from_token
+from charts import radar_chart, OVERLAYS, cache_stats as chart_cache_stats
+from content import definitions, profile_descriptions, composite_names
+from reports import FORMATS, profile_key, report_sections, section_markdown, render_report, report_file_name, cache_stats
+from sheets import WorksheetHandle, authorize
+from cohort import CohortCache, SheetsRowSource, SQLiteRowSource
+from storage import SheetsStorage, SQLiteStorage, OutboxStorage, submission_key, SHEET_COLUMNS, REFLECTION_COLUMNS
+from similarity import SimilarityIndex
+from submission_queue import QUEUED, SENDING, RETRYING, WRITTEN, PENDING_STATES
+from instrumentation import (
+    REGISTRY, enable, enabled, span, inc, begin_rerun, end_rerun, last_rerun_spans, prometheus_text
+)
 
 # ------------------------------
 # APP CONFIGURATION & CONSTANTS
 # ------------------------------
 
-# --- Constants for variable names to avoid repetition (DRY Principle) ---
-SLIDER_VARS = [
-    'openness', 'conscientiousness', 'extraversion', 'agreeableness', 'neuroticism',
-    'selfEfficacy', 'selfAwareness', 'selfManagement', 'socialAwareness',
-    'relationshipSkills', 'decisionMaking'
-]
-CATEGORICAL_VARS = ['identity', 'moral', 'cognitive', 'priorAch']
-ALL_VARS = SLIDER_VARS + CATEGORICAL_VARS
-
 # --- Google Sheets Configuration ---
 SHEET_ID = "18rQex9dBZVa62XZWX7L6ZohLKmpb4dYbmA3wU7KCk5E" # Your Sheet ID
 
 # ------------------------------
-# DATA DICTIONARIES (Definitions, Mappings, etc.)
+# GOOGLE SHEETS CONNECTION (LAZY, CACHED)
 # ------------------------------
-# (These dictionaries remain the same as your original code)
-
-definitions = {
-    'openness': "Openness – imagination, curiosity, appreciation for novelty, and preference for variety and exploration.",
-    'conscientiousness': "Conscientiousness – organization, responsibility, self-discipline, and persistence in goal-directed behavior.",
-    'extraversion': "Extraversion – sociability, assertiveness, positive emotions, and energy from interaction.",
-    'agreeableness': "Agreeableness – compassion, cooperation, trust, and concern for others.",
-    'neuroticism': "Neuroticism – tendency toward anxiety, moodiness, and emotional instability.",
-    'selfEfficacy': "Self-Efficacy – belief in one’s ability to succeed in tasks or overcome challenges.",
-    'selfAwareness': "Self-Awareness – recognizing emotions, thoughts, strengths, and limitations.",
-    'selfManagement': "Self-Management – regulating emotions, behaviors, and impulses effectively.",
-    'socialAwareness': "Social Awareness – empathy and perspective-taking across diverse groups.",
-    'relationshipSkills': "Relationship Skills – maintaining supportive relationships and resolving conflict.",
-    'decisionMaking': "Decision-Making – making ethical, safe, and constructive choices.",
-    'identity': "Identity Development – exploration and commitment to personal values and goals.",
-    'moral': "Moral Development – progression from rule-based to principle-based reasoning.",
-    'cognitive': "Cognitive Ability – capacity for reasoning, abstraction, and problem solving.",
-    'priorAch': "Prior Achievement – evidence of past mastery and readiness for future learning."
-}
-
-categorical_mappings = {
-    'identity': {'Identity Achievement': 100, 'Moratorium': 75, 'Foreclosure': 50, 'Identity Diffusion': 25},
-    'moral': {'Post-conventional': 100, 'Conventional': 75, 'Pre-conventional': 25},
-    'cognitive': {'High': 100, 'Average': 50, 'Low': 25},
-    'priorAch': {'High': 100, 'Average': 50, 'Low': 25}
-}
-
-level_mapping = {'Low': 25, 'Medium': 50, 'High': 75}
-
-profile_descriptions = {
-    "High Readiness": "Students with high readiness demonstrate consistently strong motivation, curiosity, emotional stability, and cognitive foundations. They adapt easily to challenges and thrive with autonomy and inquiry-based learning.",
-    "Moderate Readiness": "Students with moderate readiness show a solid foundation but uneven strengths. They succeed with clear guidance, structured independence, and gradual increases in complexity.",
-    "Low Readiness": "Students with low readiness face challenges in one or more domains. They need scaffolding, structured routines, and hands-on activities to build confidence and maintain engagement.",
-    "Emerging Readiness": "Students with emerging readiness are still developing core capacities. They require intensive support, predictable environments, and small, celebrated steps toward growth."
-}
-
-teaching_strategies = {
-    "openness": {"Low": "Use structured inquiry, scaffolded writing, and introduce novelty gradually.", "Medium": "Offer guided projects with bounded choice, use analogies and concept-mapping.", "High": "Encourage independent inquiry, cross-disciplinary projects, and original problem framing."},
-    "conscientiousness": {"Low": "Provide checklists, visible routines, and peer accountability.", "Medium": "Set weekly goals, track progress, and scaffold deadlines.", "High": "Promote self-monitoring, long-term planning, and leadership in group projects."},
-    "extraversion": {"Low": "Encourage reflection journals, pair work, and low-pressure sharing.", "Medium": "Balance independent and collaborative tasks with structured discussion roles.", "High": "Leverage debates, peer teaching, and group leadership opportunities."},
-    "agreeableness": {"Low": "Teach negotiation skills explicitly; structure cooperative activities.", "Medium": "Use group tasks with clear interdependence.", "High": "Assign mentoring or mediation roles; promote prosocial group norms."},
-    "neuroticism": {"Low": "Encourage resilience-building tasks; leadership in challenges.", "Medium": "Provide predictable routines and model coping strategies.", "High": "Teach emotional regulation, provide check-ins, and avoid excessive pressure."},
-    "selfEfficacy": {"Low": "Give scaffolded tasks with frequent feedback and role models.", "Medium": "Use moderate challenges with clear criteria and celebrate growth.", "High": "Encourage capstone projects, independent learning, and stretch goals."},
-    "selfAwareness": {"Low": "Use mood meters, guided reflection, and role-play for identifying emotions.", "Medium": "Embed prediction-outcome reflections and self-assessments.", "High": "Encourage student-led reflections, strengths-based goal setting, and peer feedback."},
-    "selfManagement": {"Low": "Provide visual schedules, brain breaks, and co-regulation strategies.", "Medium": "Introduce checklists, Pomodoro timers, and self-monitoring tools.", "High": "Promote independent planning, milestone tracking, and peer accountability."},
-    "socialAwareness": {"Low": "Model empathy language and use role-play scripts.", "Medium": "Use structured academic controversies and think-pair-share with prompts.", "High": "Facilitate service learning, interviews, and perspective-taking debates."},
-    "relationshipSkills": {"Low": "Practice turn-taking games, repair statements, and guided dialogues.", "Medium": "Encourage role-based teamwork and conflict-resolution flowcharts.", "High": "Rotate facilitation roles, co-create group norms, and assign mediation duties."},
-    "decisionMaking": {"Low": "Offer two clear options with modeled reasoning; use stop-think-choose visuals.", "Medium": "Provide choice boards with criteria rubrics; rehearse pros/cons before choosing.", "High": "Use decision matrices for authentic dilemmas with consequence mapping and evidence citations."}
-}
-
-categorical_strategies = {
-    "identity": {"Identity Achievement": "Encourage independent projects, leadership roles, and reflective writing on values.", "Moratorium": "Provide exploration opportunities (career days, debates) with structured reflection.", "Foreclosure": "Expose students to diverse perspectives; encourage critical discussion of assumptions.", "Identity Diffusion": "Scaffold decision-making with small choices, use mentoring, and establish routines."},
-    "moral": {"Post-conventional": "Use ethical case studies, debates on justice, and service-learning projects.", "Conventional": "Highlight fairness, create group contracts, and reinforce rules with peer approval.", "Pre-conventional": "Make cause-effect consequences explicit; use token rewards for prosocial actions."},
-    "cognitive": {"High": "Assign inquiry-based projects, interdisciplinary synthesis, and advanced competitions.", "Average": "Support abstract ideas with examples, visuals, and think-alouds.", "Low": "Prioritize concrete, hands-on activities, visual organizers, and repeated practice."},
-    "priorAch": {"High": "Compact curriculum; offer enrichment (AP, dual-credit, project-based challenges).", "Average": "Reinforce strengths while addressing gaps with feedback and cooperative learning.", "Low": "Use mastery learning, small goals, targeted skill interventions, and celebrate progress."}
-}
-
-
-# Dictionary for detailed psychological explanations
-detailed_explanations = {
-    "key_insights": {
-        "header": "These composite scores synthesize multiple factors to provide a high-level view of a student's learning disposition. They represent the internal resources a student brings to the classroom.",
-        "Motivation": "**Motivation** reflects a student's drive and persistence. Grounded in **Expectancy-Value Theory**, it combines conscientiousness (effort regulation), self-efficacy (expectancy for success), and prior achievement (evidence of competence). High motivation is a powerful predictor of academic resilience and goal attainment.",
-        "Exploration": "**Exploration** indicates a student's curiosity and willingness to engage with novelty. It merges openness (intellectual curiosity), extraversion (social exploration), and identity development (self-exploration). Psychologically, this disposition is crucial for deep, **inquiry-based learning** and adapting to new challenges, as described by theorists like John Dewey.",
-        "Stability": "**Stability** measures a student's emotional and social readiness to learn. It combines emotional stability (inverse neuroticism), agreeableness (prosocial orientation), and moral development (understanding of social contracts). A stable student has more **cognitive resources** available for learning, rather than expending them on managing anxiety or social conflict.",
-        "Cognitive Foundation": "**Cognitive Foundation** represents the student's cognitive toolkit. It blends cognitive ability (processing efficiency), prior achievement (existing knowledge schemas, as emphasized by **David Ausubel**), and openness (willingness to restructure schemas). A strong foundation is essential for mastering complex, abstract concepts and avoiding **cognitive overload**."
-    },
-    "sel_focus": {
-        "header": "The **CASEL 5** competencies are the psychological tools that enable students to access the curriculum and navigate the social world of the classroom. They are foundational to both academic and life success.",
-        "Self-Awareness": "**Self-Awareness** is the foundation of **metacognition**—the ability to think about one's own thinking. A self-aware student can recognize when they are confused, identify their academic strengths and weaknesses, and understand how their feelings impact their learning process.",
-        "Self-Management": "**Self-Management** is directly linked to **executive functions**. It's the ability to regulate emotions, manage stress, control impulses, and persevere through challenging tasks. It is the engine of goal-directed behavior and a key component of concepts like 'grit' and academic tenacity.",
-        "Social Awareness": "**Social Awareness** involves perspective-taking and empathy. In an educational context, it's essential for effective **collaborative learning**, understanding diverse viewpoints in subjects like literature or history, and contributing to a positive and inclusive classroom climate.",
-        "Relationship Skills": "**Relationship Skills** are the practical application of social awareness. They include clear communication, active listening, cooperation, and conflict resolution. These skills are vital for participating in group projects, seeking help from peers or teachers (a key learning strategy), and building a supportive learning network.",
-        "Decision-Making": "**Decision-Making** involves making constructive choices about personal behavior and academic work. It requires analyzing situations, identifying problems, evaluating consequences, and considering ethical standards. It is a cornerstone of both critical thinking and responsible citizenship."
-    }
-}
+def storage_settings():
+    """Submission backend and SQLite path from the optional [storage] secrets section.
 
+    backend = "sheets" (default when Sheets credentials exist), "sqlite" (local only) or
+    "outbox" (SQLite first, then replicated to Sheets). Reads local secrets only, no network.
+    """
+    try:
+        settings = dict(st.secrets.get("storage", {}))
+        has_sheets = "gcp_service_account" in st.secrets
+    except FileNotFoundError:
+        settings, has_sheets = {}, False
+    return settings.get("backend", "sheets" if has_sheets else None), settings.get("path", "submissions.db")
+
+def secret_matches(section, supplied):
+    """True when `supplied` equals the `secret` in the given secrets section (constant time).
+
+    False whenever the section is missing, so features behind it stay off until configured.
+    """
+    try:
+        expected = st.secrets.get(section, {}).get("secret")
+    except FileNotFoundError:
+        expected = None
+    return bool(expected and supplied) and hmac.compare_digest(str(supplied).encode(), str(expected).encode())
 
-# ------------------------------
-# GOOGLE SHEETS CONNECTION (CACHED)
-# ------------------------------
 @st.cache_resource
-def get_gspread_client():
-    """Connect to Google Sheets using credentials from st.secrets."""
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+def get_worksheet_handle(sheet_id):
+    """Process-wide worksheet handle; the spreadsheet is only opened when a submit needs it."""
+    service_account_info = dict(st.secrets["gcp_service_account"])
+    return WorksheetHandle(lambda: authorize(service_account_info), sheet_id)
+
+@st.cache_resource
+def get_storage(backend, path, sheet_id):
+    """One storage backend per process, shared by every session.
+
+    Submitting never blocks a rerun on the Sheets API: rows are either queued for the
+    batched background writer or committed to SQLite and replicated from there.
+    """
+    if backend == "sqlite":
+        return SQLiteStorage(path)
+    if backend == "outbox":
+        return OutboxStorage(path, get_worksheet_handle(sheet_id))
+    if backend == "sheets":
+        return SheetsStorage(get_worksheet_handle(sheet_id))
+    raise ValueError(f"Unknown storage backend '{backend}'. Use 'sheets', 'sqlite' or 'outbox'.")
+
+@st.cache_resource
+def get_cohort_cache(backend, path, sheet_id):
+    """Process-wide cohort cache; each sync only fetches rows submitted since the last one."""
     try:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], scope)
-        client = gspread.authorize(creds)
-        return client
-    except Exception as e:
-        st.error(f"Failed to connect to Google Sheets. Please ensure your secrets are configured correctly. Error: {e}")
-        return None
+        snapshot_dir = st.secrets.get("cohort", {}).get("snapshot_dir")
+    except FileNotFoundError:
+        snapshot_dir = None
+    if backend == "sqlite":
+        source = SQLiteRowSource(get_storage(backend, path, sheet_id))
+    else:
+        source = SheetsRowSource(get_worksheet_handle(sheet_id))
+    return CohortCache(source, snapshot_dir=snapshot_dir)
 
-def get_sheet(client, sheet_id):
-    """Get the specific worksheet, with error handling."""
-    if client:
-        try:
-            return client.open_by_key(sheet_id).sheet1
-        except gspread.exceptions.SpreadsheetNotFound:
-            st.error(f"Spreadsheet with ID '{sheet_id}' not found. Please check your SHEET_ID.")
-            return None
-    return None
+@st.cache_resource
+def get_similarity_index(backend, path, sheet_id):
+    """Process-wide nearest-neighbour index over the cohort cache's profiles."""
+    return SimilarityIndex(get_cohort_cache(backend, path, sheet_id))
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def get_stored_rows(backend, path, sheet_id, rows):
+    """Stored rows by source index. Submissions never change, so they are cached without expiry."""
+    return get_cohort_cache(backend, path, sheet_id).fetch_rows(list(rows))
 
 # ------------------------------
 # INITIALIZE SESSION STATE
@@ -144,63 +107,46 @@ def initialize_state():
         'agreeableness': 'Medium', 'neuroticism': 'Medium', 'identity': 'Identity Achievement',
         'moral': 'Conventional', 'cognitive': 'Average', 'priorAch': 'Average',
         'selfEfficacy': 'Medium', 'selfAwareness': 'Medium', 'selfManagement': 'Medium',
-        'socialAwareness': 'Medium', 'relationshipSkills': 'Medium', 'decisionMaking': 'Medium'
+        'socialAwareness': 'Medium', 'relationshipSkills': 'Medium', 'decisionMaking': 'Medium',
+        'batch_factor_changes': True, 'show_cohort': False
     }
     for key, value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
-
-# ------------------------------
-# CALCULATION & LOGIC FUNCTIONS
-# ------------------------------
-def map_level(level): return level_mapping.get(level, 0)
-
-def calculateCompositeScores():
-    scores = {}
-    scores['motivation'] = round((
-        map_level(st.session_state.conscientiousness) +
-        map_level(st.session_state.selfEfficacy) +
-        categorical_mappings['priorAch'][st.session_state.priorAch]
-    ) / 3)
-    scores['exploration'] = round((
-        map_level(st.session_state.openness) +
-        map_level(st.session_state.extraversion) +
-        categorical_mappings['identity'][st.session_state.identity]
-    ) / 3)
-    scores['stability'] = round((
-        map_level(st.session_state.agreeableness) +
-        (100 - map_level(st.session_state.neuroticism)) +  # Inverse neuroticism
-        categorical_mappings['moral'][st.session_state.moral]
-    ) / 3)
-    scores['cognitiveFoundation'] = round((
-        categorical_mappings['cognitive'][st.session_state.cognitive] +
-        categorical_mappings['priorAch'][st.session_state.priorAch] +
-        map_level(st.session_state.openness)
-    ) / 3)
-    # Direct mapping for SEL scores
-    for sel_var in ['selfAwareness', 'selfManagement', 'socialAwareness', 'relationshipSkills', 'decisionMaking']:
-        scores[sel_var] = map_level(st.session_state[sel_var])
-    return scores
-
-def determineReadinessProfile(scores):
-    avg = round((scores['motivation'] + scores['exploration'] + scores['stability'] + scores['cognitiveFoundation']) / 4)
-    if avg >= 75: return 'High Readiness'
-    if avg >= 50: return 'Moderate Readiness'
-    if avg >= 25: return 'Low Readiness'
-    return 'Emerging Readiness'
-
-def getLevel(v): return 'high' if v >= 75 else 'medium' if v >= 50 else 'low'
+    # Scopes submission idempotency keys to this browser session.
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+
+    # Restore a shared profile from the URL (?profile=<token>) once per session.
+    token = st.query_params.get('profile')
+    if token and not st.session_state.get('profile_token_restored'):
+        st.session_state.profile_token_restored = True
+        try:
+            st.session_state.update(decode_profile(from_token(token)))
+        except ValueError:
+            st.warning(f"Could not restore profile code '{token}'. Showing the default profile instead.")
 
 # ------------------------------
 # UI & DISPLAY FUNCTIONS
 # ------------------------------
-def create_radar_chart():
-    data = [map_level(st.session_state[var]) for var in SLIDER_VARS]
-    labels = [var.replace('self', 'Self ').replace('social', 'Social ').capitalize() for var in SLIDER_VARS]
-    fig = go.Figure()
-    fig.add_trace(go.Scatterpolar(r=data, theta=labels, fill='toself', name='Profile'))
-    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False)
-    return fig
+def create_radar_chart(overlay=None, distribution=None):
+    return radar_chart([map_level(st.session_state[var]) for var in SLIDER_VARS], overlay, distribution)
+
+def build_factor_inputs():
+    for var in SLIDER_VARS:
+        st.select_slider(var.capitalize(), ['Low', 'Medium', 'High'], key=var, help=definitions[var])
+        
+    st.header("Categorical Factors")
+    
+    st.selectbox("Identity Status", list(categorical_mappings['identity'].keys()), key='identity', help=definitions['identity'])
+    st.selectbox("Moral Development", list(categorical_mappings['moral'].keys()), key='moral', help=definitions['moral'])
+    st.selectbox("Cognitive Ability", list(categorical_mappings['cognitive'].keys()), key='cognitive', help=definitions['cognitive'])
+    st.selectbox("Prior Achievement", list(categorical_mappings['priorAch'].keys()), key='priorAch', help=definitions['priorAch'])
+
+def verify_instructor():
+    """Checks the entered secret once, then forgets it."""
+    st.session_state.instructor_verified = secret_matches("instructor", st.session_state.instructor_secret)
+    st.session_state.instructor_secret = ''
 
 def build_sidebar():
     with st.sidebar:
@@ -212,186 +158,360 @@ def build_sidebar():
 
         st.header("Adjust Factors")
         st.write("Adjust the levels below. Hover over ❓ for definitions.")
-        
-        for var in SLIDER_VARS:
-            st.select_slider(var.capitalize(), ['Low', 'Medium', 'High'], key=var, help=definitions[var])
-            
-        st.header("Categorical Factors")
-        
-        st.selectbox("Identity Status", list(categorical_mappings['identity'].keys()), key='identity', help=definitions['identity'])
-        st.selectbox("Moral Development", list(categorical_mappings['moral'].keys()), key='moral', help=definitions['moral'])
-        st.selectbox("Cognitive Ability", list(categorical_mappings['cognitive'].keys()), key='cognitive', help=definitions['cognitive'])
-        st.selectbox("Prior Achievement", list(categorical_mappings['priorAch'].keys()), key='priorAch', help=definitions['priorAch'])
+        # In batch mode the factor widgets sit in a form: moving several of them costs one rerun on "Apply".
+        if st.toggle("Apply factor changes together", key='batch_factor_changes',
+                     help="When on, factor changes take effect only after pressing Apply."):
+            with st.form('factor_form', border=False):
+                build_factor_inputs()
+                st.form_submit_button("Apply Changes", type='primary', use_container_width=True)
+        else:
+            build_factor_inputs()
+
+        st.divider()
+        st.header("📈 Instructors")
+        st.toggle("Show cohort analytics", key='show_cohort', help="Aggregate results across all past submissions.")
+        if st.session_state.show_cohort and not st.session_state.get('instructor_verified'):
+            # Aggregates are open to everyone; other teachers' submissions are not.
+            st.text_input("Instructor secret", type='password', key='instructor_secret', on_change=verify_instructor,
+                          help="Unlocks the similar-learners panel, which shows past submissions and their reflections.")
+            if st.session_state.get('instructor_verified') is False:
+                st.error("That instructor secret is not correct.")
+
+        st.divider()
+        st.header("🔗 Profile Code")
+        token = to_token(encode_profile(st.session_state))
+        st.code(token, language=None)
+        st.caption(f"Share this profile by adding `?profile={token}` to the app URL.")
 
-# Refactored display logic to be more direct and integrated.
-def display_full_interpretation(profile, scores):
+# Section bodies come from the report cache, so repeated profiles cost a dictionary lookup.
+def display_full_interpretation(key):
     """Renders the entire interpretation section with integrated psychological explanations."""
+    profile, sections = report_sections(key)
+    bodies = section_markdown(key)
     st.header("💡 Interpretation & Strategies")
     st.markdown(f"### {profile}")
     st.markdown(f"_{profile_descriptions[profile]}_")
 
-    with st.expander("Key Insights & Psychological Meaning", expanded=True):
-        st.info(detailed_explanations["key_insights"]["header"])
-        
-        # Motivation
-        st.markdown(f"**Motivation:** `{getLevel(scores['motivation']).capitalize()}`")
-        st.markdown(detailed_explanations["key_insights"]["Motivation"])
-        
-        # Exploration
-        st.markdown(f"**Exploration:** `{getLevel(scores['exploration']).capitalize()}`")
-        st.markdown(detailed_explanations["key_insights"]["Exploration"])
-        
-        # Stability
-        st.markdown(f"**Stability:** `{getLevel(scores['stability']).capitalize()}`")
-        st.markdown(detailed_explanations["key_insights"]["Stability"])
-        
-        # Cognitive Foundation
-        st.markdown(f"**Cognitive Foundation:** `{getLevel(scores['cognitiveFoundation']).capitalize()}`")
-        st.markdown(detailed_explanations["key_insights"]["Cognitive Foundation"])
-        
-    with st.expander("SEL Focus (CASEL) & Psychological Meaning", expanded=True):
-        st.info(detailed_explanations["sel_focus"]["header"])
-        
-        # SEL Competencies
-        sel_map = {'selfAwareness': 'Self-Awareness', 'selfManagement': 'Self-Management', 'socialAwareness': 'Social Awareness', 'relationshipSkills': 'Relationship Skills', 'decisionMaking': 'Decision-Making'}
-        for key, name in sel_map.items():
-            st.markdown(f"**{name}:** `{getLevel(scores[key]).capitalize()}`")
-            st.markdown(detailed_explanations["sel_focus"][name])
-    
-    with st.expander("Recommended Teaching Strategies", expanded=True):
-        for var in SLIDER_VARS:
-            level = st.session_state[var]
-            st.markdown(f"**{var.capitalize()}:** {teaching_strategies[var][level]}")
-            
-    with st.expander("Strategies for Foundational Domains", expanded=True):
-         for var in CATEGORICAL_VARS:
-            value = st.session_state[var]
-            st.markdown(f"**{var.capitalize()} ({value}):** {categorical_strategies[var][value]}")
-            
-    with st.expander("Cognitive Development Supports", expanded=True):
-        support_texts = {
-            "High Readiness": "- **Piaget:** Cross-disciplinary projects linking subjects.\n- **Vygotsky:** Advanced problem sets just above mastery with peer teaching.\n- **Bronfenbrenner:** Leadership roles, family showcases.\n",
-            "Moderate Readiness": "- **Piaget:** Concept maps and analogies to deepen schemas.\n- **Vygotsky:** Guided practice with gradual release.\n- **Bronfenbrenner:** Cooperative group tasks, parent progress talks.\n",
-            "Low Readiness": "- **Piaget:** Concrete, hands-on tasks (labs, manipulatives).\n- **Vygotsky:** Stepwise scaffolding with checks for understanding.\n- **Bronfenbrenner:** Stable peer groups, structured home prompts.\n",
-            "Emerging Readiness": "- **Piaget:** Anchor new ideas in familiar, routine contexts.\n- **Vygotsky:** Intensive one-on-one scaffolding.\n- **Bronfenbrenner:** Peer co-regulation, parent reinforcement of routines.\n"
-        }
-        st.markdown(support_texts.get(profile, ""))
+    for name in ('key_insights', 'sel_focus'):
+        with st.expander(sections[name].title, expanded=True):
+            st.info(sections[name].intro)
+            st.markdown(bodies[name])
+
+    for name in ('teaching_strategies', 'foundational_domains'):
+        with st.expander(sections[name].title, expanded=True):
+            st.markdown(bodies[name])
+
+    with st.expander(sections['cognitive_supports'].title, expanded=True):
+        st.markdown(sections['cognitive_supports'].intro)
 
 # Function to generate the text for the download button
-def generate_downloadable_text(profile, scores):
-    """Creates a clean text string of the full report for downloading."""
-    
-    # Profile and Description
-    full_text = [
-        f"Name: {st.session_state.user_name}",
-        f"Subject: {st.session_state.subject}\n",
-        f"READINESS PROFILE: {profile}",
-        f"{profile_descriptions[profile]}\n"
-    ]
-
-    # Key Insights
-    insights_text = [f"--- Key Insights & Psychological Meaning ---\n{detailed_explanations['key_insights']['header']}\n"]
-    for key, name in {'motivation': 'Motivation', 'exploration': 'Exploration', 'stability': 'Stability', 'cognitiveFoundation': 'Cognitive Foundation'}.items():
-        insights_text.append(f"**{name}:** {getLevel(scores[key]).capitalize()}")
-        insights_text.append(f"{detailed_explanations['key_insights'][name]}\n")
-    full_text.append("\n".join(insights_text))
-
-    # SEL Focus
-    sel_text = [f"--- SEL Focus (CASEL) & Psychological Meaning ---\n{detailed_explanations['sel_focus']['header']}\n"]
-    sel_map = {'selfAwareness': 'Self-Awareness', 'selfManagement': 'Self-Management', 'socialAwareness': 'Social Awareness', 'relationshipSkills': 'Relationship Skills', 'decisionMaking': 'Decision-Making'}
-    for key, name in sel_map.items():
-        sel_text.append(f"**{name}:** {getLevel(scores[key]).capitalize()}")
-        sel_text.append(f"{detailed_explanations['sel_focus'][name]}\n")
-    full_text.append("\n".join(sel_text))
-
-    # Teaching Strategies
-    strategy_text = ["--- Recommended Teaching Strategies ---\n"]
-    for var in SLIDER_VARS:
-        level = st.session_state[var]
-        strategy_text.append(f"**{var.capitalize()}:** {teaching_strategies[var][level]}")
-    full_text.append("\n".join(strategy_text))
+def generate_downloadable_text(key, fmt='txt'):
+    """Creates the full report for downloading; only the name/subject header is rendered per call."""
+    return render_report(key, st.session_state.user_name, st.session_state.subject, fmt)
+
+def render_submission_status(storage, ticket):
+    state, error = storage.status(ticket)
+    local = isinstance(storage, OutboxStorage)
+    if state in (QUEUED, SENDING):
+        st.info("⏳ Your responses are queued and will be saved to Google Sheets shortly.")
+    elif state == RETRYING:
+        st.info("⏳ Google Sheets is busy; your responses are queued and will be retried automatically.")
+    elif state == WRITTEN:
+        st.success("✅ Your responses have been recorded!")
+    elif local:
+        # The outbox keeps the row; submitting again puts it back in the queue.
+        st.warning(f"💾 Your responses are saved locally but not yet in Google Sheets ({error}). Submit again to retry.")
+    else:
+        st.error(f"❌ Failed to submit to Google Sheets: {error}")
+    return state
+
+def show_submission_status(storage, ticket):
+    """Shows the outcome of a queued submission, polling while it is still pending."""
+    if storage.status(ticket)[0] not in PENDING_STATES:
+        render_submission_status(storage, ticket)
+        return
+
+    # Only this fragment reruns while polling; once the outcome is known one full rerun stops it.
+    @st.fragment(run_every=2)
+    def poll():
+        if render_submission_status(storage, ticket) not in PENDING_STATES:
+            st.rerun()
+    poll()
 
-    return "\n".join(full_text)
+# ------------------------------
+# PAGE REGIONS (FRAGMENTS)
+# ------------------------------
+SIMILARITY_WEIGHTS = [0, 0.5, 1, 2, 3]
+REFLECTION_LABELS = dict(zip(REFLECTION_COLUMNS, ["Key Insights", "SEL Focus", "Teaching Strategies", "Foundational Domains"]))
+
+def similar_learners(profile_code, backend, storage_path):
+    """Past submissions closest to this profile, with the reflections their teachers wrote."""
+    st.header("🧭 Similar Learners")
+    cohort = get_cohort_cache(backend, storage_path, SHEET_ID)
+    index = get_similarity_index(backend, storage_path, SHEET_ID)
+    try:
+        with span('cohort_sync'):
+            cohort.sync()
+    except Exception as e:
+        st.warning(f"Could not load past submissions: {e}")
+
+    with st.expander("Weighting"):
+        weights = {name: st.select_slider(label, SIMILARITY_WEIGHTS, value=1, key=f'similarity_weight_{name}')
+                   for name, label in composite_names.items()}
+        sel_weight = st.select_slider("SEL competencies", SIMILARITY_WEIGHTS, value=1, key='similarity_weight_sel')
+        weights.update({var: sel_weight for var in SEL_VARS})
+    if not any(weights.values()):
+        st.info("Give at least one dimension a weight above 0.")
+        return
+
+    with span('similarity'):
+        index.refresh()
+        matches = [match for match in index.query(profile_code, k=5, weights=weights) if match[0] >= 0]
+    if not matches:
+        st.info("No past submissions to compare with yet.")
+        return
 
+    try:
+        rows = get_stored_rows(backend, storage_path, SHEET_ID, tuple(row for row, _, _ in matches))
+    except Exception as e:
+        st.warning(f"Could not load the matching submissions: {e}")
+        return
+    column = {name: i for i, name in enumerate(SHEET_COLUMNS)}
+    for (_, code, distance), row in zip(matches, rows):
+        row = row + [''] * (len(SHEET_COLUMNS) - len(row))
+        with st.expander(f"{profile_for_code(code)} · {row[column['subject']] or 'No subject'} · {distance:.1f} pts apart"):
+            st.caption(f"{row[column['user_name']]}, {row[column['timestamp']]}")
+            notes = [(REFLECTION_LABELS[name], row[column[name]]) for name in REFLECTION_COLUMNS if row[column[name]]]
+            for label, text in notes:
+                st.markdown(f"**{label}:** {text}")
+            if not notes:
+                st.caption("No reflections were written for this profile.")
+
+@st.fragment
+def profile_panel(report_key, profile_code):
+    """Chart and interpretation. Only a factor change (a full rerun) rebuilds them."""
+    st.header("📊 Readiness Profile")
+    overlay, distribution = None, None
+    backend, storage_path = storage_settings()
+    if backend:
+        # Changing the overlay reruns this fragment only.
+        overlay = st.radio("Compare with cohort", OVERLAYS, horizontal=True, key='radar_overlay',
+                           format_func=lambda o: {None: 'Off', 'median': 'Median', 'quartiles': 'Quartile band', 'density': 'Density'}[o])
+    if overlay:
+        cohort = get_cohort_cache(backend, storage_path, SHEET_ID)
+        try:
+            with span('cohort_sync'):
+                cohort.sync()
+        except Exception as e:
+            st.warning(f"Cohort data unavailable, showing the profile alone: {e}")
+        if cohort.size:
+            distribution = cohort.slider_distribution()
+    with span('radar_chart'):
+        st.plotly_chart(create_radar_chart(overlay, distribution), use_container_width=True)
+
+    if backend and st.session_state.show_cohort and st.session_state.get('instructor_verified'):
+        # Instructors see the closest past submissions next to the interpretation.
+        interpretation_col, similar_col = st.columns([2, 1])
+        with interpretation_col, span('interpretation'):
+            display_full_interpretation(report_key)
+        with similar_col:
+            similar_learners(profile_code, backend, storage_path)
+    else:
+        with span('interpretation'):
+            display_full_interpretation(report_key)
+
+@st.fragment
+def reflections_and_actions(profile, profile_code, report_key):
+    """Reflections, submission and download. Edits here never recompute scores or the chart."""
+    # --- Reflections and Actions (Now at the bottom in columns for better use of space) ---
+    st.header("💭 Reflection Prompts")
+    reflect_col1, reflect_col2 = st.columns(2)
+    with reflect_col1:
+        key_insights_reflection = st.text_area("Reflection on Key Insights: What Does this mean in your subject?", height=150, key='key_insights_reflection')
+        teaching_strategies_reflection = st.text_area("Reflection on Teaching Strategies: What specific activities or tasks would you use in your class?", height=150, key='teaching_strategies_reflection')
+
+    with reflect_col2:
+        sel_focus_reflection = st.text_area("Reflection on SEL Focus: How would you promote personal growth and harmony in your classroom?", height=150, key='sel_focus_reflection')
+        foundational_domains_reflection = st.text_area("Reflection on Foundational Domains: What would you do to advance this learners knowledge to the next stage?", height=150, key='foundational_domains_reflection')
+
+    st.divider()
+
+    # --- Action Buttons ---
+    action_col1, action_col2 = st.columns([1,1])
+
+    with action_col1:
+        # --- Submission ---
+        backend, storage_path = storage_settings()
+        if backend:
+            submit_enabled = st.session_state.user_name != "" and st.session_state.subject != ""
+        
+            content = [
+                st.session_state.user_name, st.session_state.subject, profile
+            ] + [st.session_state[var] for var in ALL_VARS] + \
+                [key_insights_reflection, sel_focus_reflection, 
+                teaching_strategies_reflection, foundational_domains_reflection] + \
+                [profile_code]
+            # Identical content from the same session (e.g. a double-click) gets the same key
+            # and is stored only once.
+            key = submission_key(st.session_state.session_id, *content)
+
+            if st.button("Submit Reflections and Profile to Google Sheets", disabled=not submit_enabled, use_container_width=True):
+                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                new_row = [timestamp] + content + [key]
+
+                # The storage backend returns immediately; the ticket lets us poll the outcome.
+                with span('submit'):
+                    st.session_state.submission_ticket = get_storage(backend, storage_path, SHEET_ID).submit(new_row)
+                st.session_state.submitted_key = key
+                inc('submissions_total', backend=backend)
+                count_session('submissions')
+            elif not submit_enabled:
+                st.warning("Please enter your Name and Subject to enable submission.")
+
+            # The status belongs to what was submitted: editing the profile or a reflection hides it.
+            if st.session_state.get('submission_ticket') and st.session_state.get('submitted_key') == key:
+                show_submission_status(get_storage(backend, storage_path, SHEET_ID), st.session_state.submission_ticket)
+        else:
+            st.error("Google Sheets is not configured. Please ensure your secrets are configured correctly.")
+
+    with action_col2:
+        # --- Download ---
+        download_format = st.radio("Format", list(FORMATS), horizontal=True, key='download_format',
+                                   format_func=lambda fmt: {'txt': 'Text', 'markdown': 'Markdown', 'html': 'HTML'}[fmt])
+        with span('download_payload'):
+            payload = generate_downloadable_text(report_key, download_format)
+        st.download_button(
+            label="📥 Download Profile Summary",
+            data=payload,
+            file_name=report_file_name(st.session_state.user_name, download_format),
+            mime=FORMATS[download_format][1],
+            use_container_width=True
+        )
+
+@st.fragment
+def cohort_dashboard(cohort):
+    """Aggregates over past submissions; refreshing reruns this region only."""
+    import pandas as pd  # only instructors who open the dashboard pay for pandas
+    st.header("📈 Cohort Analytics")
+    force = st.button("🔄 Refresh Cohort Data")
+    try:
+        with span('cohort_sync'):
+            cohort.sync(force=force)
+    except Exception as e:
+        st.error(f"❌ Could not load past submissions: {e}")
+    summary = cohort.summary()
+    if not summary['total']:
+        st.info("No submissions yet.")
+        return
+
+    metric_cols = st.columns(5)
+    metric_cols[0].metric("Profiles", summary['total'])
+    for col, (name, mean) in zip(metric_cols[1:], summary['composite_means'].items()):
+        col.metric(f"Mean {composite_names[name]}", f"{mean:.1f}")
+
+    st.subheader("Readiness Profile Distribution")
+    st.bar_chart(pd.Series(summary['profiles'], name="Students"))
+
+    st.subheader("Factor Levels")
+    slider_tab, categorical_tab = st.tabs(["Personality & SEL", "Foundational Domains"])
+    with slider_tab:
+        st.bar_chart(pd.DataFrame({var.capitalize(): summary['levels'][var] for var in SLIDER_VARS}).T)
+    with categorical_tab:
+        for col, var in zip(st.columns(len(CATEGORICAL_VARS)), CATEGORICAL_VARS):
+            with col:
+                st.caption(var.capitalize())
+                st.bar_chart(pd.Series(summary['levels'][var], name="Students"))
+
+# ------------------------------
+# DIAGNOSTICS (?diagnostics=<secret>)
+# ------------------------------
+def count_session(name):
+    """Per-session counter shown in the diagnostics panel (only kept while metrics are on)."""
+    if enabled():
+        counts = st.session_state.setdefault('diagnostics_counts', {})
+        counts[name] = counts.get(name, 0) + 1
+
+def diagnostics_panel():
+    """Stage timings for the last rerun plus the process-wide histograms, counters and exports."""
+    import pandas as pd
+    with st.expander("🩺 Diagnostics", expanded=True):
+        if not enabled():
+            st.info("Metric collection is off for this process (set PROFILES_METRICS=1 to start with it on).")
+            if st.button("Start collecting metrics"):
+                enable()  # for the whole process, until it restarts
+                st.rerun()
+            return
+        st.caption("Stage timings are from this session's last full rerun; histograms cover the whole process.")
+        spans = last_rerun_spans()
+        st.dataframe(pd.DataFrame({'stage': list(spans), 'ms': [round(v * 1000, 3) for v in spans.values()]}),
+                     hide_index=True, use_container_width=True)
+
+        counts = st.session_state.get('diagnostics_counts', {})
+        stats = list(cache_stats().values()) + [chart_cache_stats()]
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("Session reruns", counts.get('reruns', 0))
+        metric_cols[1].metric("Session submissions", counts.get('submissions', 0))
+        metric_cols[2].metric("Report/chart cache hits", sum(info['hits'] for info in stats))
+        metric_cols[3].metric("Report/chart cache misses", sum(info['misses'] for info in stats))
+
+        snapshot = REGISTRY.snapshot()
+        if snapshot['histograms']:
+            st.dataframe(pd.DataFrame([
+                {'metric': h['name'], 'labels': ", ".join(f"{k}={v}" for k, v in h['labels'].items()),
+                 'count': h['count'], 'mean ms': round(h['sum'] / h['count'] * 1000, 3) if h['count'] else 0.0,
+                 'p50 ≤ ms': h['p50'] * 1000, 'p99 ≤ ms': h['p99'] * 1000}
+                for h in snapshot['histograms']]), hide_index=True, use_container_width=True)
+
+        export_col1, export_col2 = st.columns(2)
+        export_col1.download_button("Prometheus metrics", prometheus_text(), file_name="profiles_metrics.prom",
+                                    mime="text/plain", use_container_width=True)
+        export_col2.download_button("JSON snapshot", json.dumps(snapshot, indent=2), file_name="profiles_metrics.json",
+                                    mime="application/json", use_container_width=True)
 
 # ------------------------------
 # MAIN APP EXECUTION
 # ------------------------------
 st.set_page_config(layout="wide")
+# ?diagnostics=<secret> (the `secret` in the [diagnostics] secrets section) shows operators the
+# diagnostics panel. Collection itself stays as configured (PROFILES_METRICS) until they turn it on.
+show_diagnostics = secret_matches("diagnostics", st.query_params.get('diagnostics'))
+begin_rerun()
+count_session('reruns')
+
 st.title("🎓 Personality, SEL, and Learning Factors Dashboard")
 
 # --- Initialize ---
 initialize_state()
-client = get_gspread_client()
-sheet = get_sheet(client, SHEET_ID)
 
 # --- Sidebar ---
-build_sidebar()
+with span('sidebar'):
+    build_sidebar()
 
 # --- Main Page Content ---
-scores = calculateCompositeScores()
-profile = determineReadinessProfile(scores)
+with span('score'):
+    report_key = profile_key(st.session_state)
+    # The whole profile packs into one integer; the readiness profile is a table lookup on it.
+    profile_code = encode_profile(st.session_state)
+    profile = profile_for_code(profile_code)
 
 # UPDATED: Re-structured the main page layout for better flow
 # The page now flows from top to bottom: Chart -> Interpretation -> Reflections -> Actions.
-
-st.header("📊 Readiness Profile")
-st.plotly_chart(create_radar_chart(), use_container_width=True)
-    
-display_full_interpretation(profile, scores)
-
-st.divider()
-
-# --- Reflections and Actions (Now at the bottom in columns for better use of space) ---
-st.header("💭 Reflection Prompts")
-reflect_col1, reflect_col2 = st.columns(2)
-with reflect_col1:
-    key_insights_reflection = st.text_area("Reflection on Key Insights: What Does this mean in your subject?", height=150)
-    teaching_strategies_reflection = st.text_area("Reflection on Teaching Strategies: What specific activities or tasks would you use in your class?", height=150)
-
-with reflect_col2:
-    sel_focus_reflection = st.text_area("Reflection on SEL Focus: How would you promote personal growth and harmony in your classroom?", height=150)
-    foundational_domains_reflection = st.text_area("Reflection on Foundational Domains: What would you do to advance this learners knowledge to the next stage?", height=150)
+# Both regions are fragments: interacting inside one reruns only that region.
+profile_panel(report_key, profile_code)
 
 st.divider()
 
-# --- Action Buttons ---
-action_col1, action_col2 = st.columns([1,1])
+reflections_and_actions(profile, profile_code, report_key)
 
-with action_col1:
-    # --- Submission ---
-    if sheet:
-        submit_enabled = st.session_state.user_name != "" and st.session_state.subject != ""
-        
-        if st.button("Submit Reflections and Profile to Google Sheets", disabled=not submit_enabled, use_container_width=True):
-            try:
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                new_row = [
-                    timestamp, st.session_state.user_name, st.session_state.subject, profile
-                ] + [st.session_state[var] for var in ALL_VARS] + \
-                    [key_insights_reflection, sel_focus_reflection, 
-                    teaching_strategies_reflection, foundational_domains_reflection]
-                
-                 # UPDATED: The sheet writing operation is now wrapped in the lock.
-                with _lock:
-                    sheet.append_row(new_row)
-                st.success("✅ Your responses have been recorded!")
-            except Exception as e:
-                st.error(f"❌ Failed to submit to Google Sheets: {str(e)}")
-        elif not submit_enabled:
-            st.warning("Please enter your Name and Subject to enable submission.")
-
-with action_col2:
-    # --- Download ---
-    download_text = generate_downloadable_text(profile, scores)
-    buffer = io.StringIO()
-    buffer.write(download_text)
-    file_name = f"{st.session_state.user_name.replace(' ', '_')}_Profile_Summary.txt" if st.session_state.user_name else "Profile_Summary.txt"
-    st.download_button(
-        label="📥 Download Profile Summary",
-        data=buffer.getvalue(),
-        file_name=file_name,
-        mime="text/plain",
-        use_container_width=True
-    )
+if st.session_state.show_cohort:
+    st.divider()
+    backend, storage_path = storage_settings()
+    if backend:
+        cohort_dashboard(get_cohort_cache(backend, storage_path, SHEET_ID))
+    else:
+        st.error("Cohort analytics need a configured submission backend.")
 
+end_rerun()
+if show_diagnostics:
+    st.divider()
+    diagnostics_panel()
@@ -0,0 +1,218 @@
+"""A local stand-in for the Google Sheets v4 REST API, for load tests.
+
+Serves the endpoints gspread uses for this app (spreadsheet metadata, values get, append and
+batchGet) over real HTTP, so the real gspread client, its APIError handling and the app's
+retry logic all run unchanged. Latency, an error rate, dropped responses after a successful
+append and a per-minute request quota can be configured to rehearse a busy workshop offline.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+SHEETS_API = "https://sheets.googleapis.com"
+SHEET_TITLE = "Sheet1"
+
+
+def _column_number(letters):
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+def parse_range(label):
+    """(first row, last row, first column, last column) from A1 notation, 1-based.
+
+    A missing bound is None (open-ended); a bare sheet name covers the whole sheet.
+    """
+    if '!' not in label:
+        return 1, None, 1, None
+    bounds = []
+    for part in label.rsplit('!', 1)[1].split(':'):
+        letters, digits = re.fullmatch(r"([A-Z]*)(\d*)", part).groups()
+        bounds.append((int(digits) if digits else None, _column_number(letters) if letters else None))
+    (first_row, first_col), (last_row, last_col) = bounds[0], bounds[-1]
+    if len(bounds) == 1:
+        last_row, last_col = first_row, first_col
+    return first_row or 1, last_row, first_col or 1, last_col
+
+
+class FakeSheetsServer:
+    """One spreadsheet with one worksheet, served on 127.0.0.1 from a background thread.
+
+    `latency` (+ up to `jitter`) seconds is added to every request. `error_rate` of requests
+    fail with 503 before doing anything; `drop_rate` of appends are applied but the connection
+    is closed without a response (the ambiguous case). More than `quota` requests in any
+    `quota_window` seconds are rejected with 429, like the Sheets per-minute quota. Reads that
+    start past the grid fail with 400, as they do on Sheets.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, drop_rate=0.0, quota=None, quota_window=60.0, seed=None):
+        self.latency, self.jitter = latency, jitter
+        self.error_rate, self.drop_rate = error_rate, drop_rate
+        self.quota, self.quota_window = quota, quota_window
+        self.rows = []           # stored rows, as strings
+        self.append_times = []   # time.time() at which each stored row landed
+        self.stats = Counter()   # requests per operation plus injected failures
+        self._random = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def grid_rows(self):
+        """Rows in the sheet's grid: 1000 for a new sheet, grown by appends to exactly fit."""
+        return max(1000, len(self.rows))
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-sheets', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def client(self):
+        """A real gspread client whose requests go to this server instead of Google."""
+        import gspread
+        return gspread.Client(None, session=RedirectSession(self.url))
+
+    # --- Request handling ---
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server._serve(self, 'GET')
+
+            def do_POST(self):
+                server._serve(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _serve(self, request, method):
+        url = urlparse(request.path)
+        params = parse_qs(url.query)
+        body = request.rfile.read(int(request.headers.get('Content-Length') or 0))
+        path = unquote(url.path).split('/v4/spreadsheets/', 1)[-1]
+        sheet_id, _, rest = path.partition('/')
+        if method == 'POST' and rest.endswith(':append'):
+            op = 'append'
+        elif rest.startswith('values:batchGet'):
+            op = 'batch_get'
+        elif rest.startswith('values/'):
+            op = 'get'
+        elif not rest:
+            op = 'metadata'
+        else:
+            return self._reply(request, 404, {'error': {'code': 404, 'message': f"No such endpoint: {path}", 'status': 'NOT_FOUND'}})
+
+        time.sleep(self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0))
+        with self._lock:
+            self.stats[op] += 1
+            failure = self._failure(op)
+            if failure == 'drop':
+                self._append(json.loads(body)['values'])
+            elif failure is None:
+                status, payload = self._handle(op, sheet_id, rest, params, body)
+        if failure == 'drop':
+            # The write happened, but the client never hears about it.
+            request.close_connection = True
+            request.connection.shutdown(2)
+            return
+        if failure == 'quota':
+            return self._reply(request, 429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                                        'message': "Quota exceeded for 'Write requests per minute per user'."}})
+        if failure == 'error':
+            return self._reply(request, 503, {'error': {'code': 503, 'status': 'UNAVAILABLE', 'message': "The service is currently unavailable."}})
+        self._reply(request, status, payload)
+
+    def _failure(self, op):
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > self.quota_window:
+            self._recent.popleft()
+        if self.quota is not None and len(self._recent) >= self.quota:
+            self.stats['quota_rejected'] += 1
+            return 'quota'
+        self._recent.append(now)
+        if self._random.random() < self.error_rate:
+            self.stats['errors_injected'] += 1
+            return 'error'
+        if op == 'append' and self._random.random() < self.drop_rate:
+            self.stats['responses_dropped'] += 1
+            return 'drop'
+        return None
+
+    def _handle(self, op, sheet_id, rest, params, body):
+        if op == 'metadata':
+            return 200, {'spreadsheetId': sheet_id, 'properties': {'title': 'Load test'}, 'sheets': [{'properties': {
+                'sheetId': 0, 'title': SHEET_TITLE, 'index': 0, 'sheetType': 'GRID',
+                'gridProperties': {'rowCount': self.grid_rows, 'columnCount': 26}}}]}
+        if op == 'append':
+            values = json.loads(body)['values']
+            first = len(self.rows) + 1
+            self._append(values)
+            return 200, {'spreadsheetId': sheet_id, 'updates': {'spreadsheetId': sheet_id, 'updatedRows': len(values),
+                                                                'updatedRange': f"{SHEET_TITLE}!A{first}:Z{len(self.rows)}"}}
+        major = params.get('majorDimension', ['ROWS'])[0]
+        labels = params.get('ranges', []) if op == 'batch_get' else [rest[len('values/'):]]
+        for label in labels:
+            if parse_range(label)[0] > self.grid_rows:
+                return 400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT', 'message':
+                             f"Range ({label}) exceeds grid limits. Max rows: {self.grid_rows}, max columns: 26"}}
+        if op == 'batch_get':
+            return 200, {'spreadsheetId': sheet_id, 'valueRanges': [self._values(label, major) for label in labels]}
+        return 200, self._values(labels[0], major)
+
+    def _append(self, values):
+        self.rows.extend([str(value) for value in row] for row in values)
+        self.append_times.extend([time.time()] * len(values))
+
+    def _values(self, label, major):
+        first_row, last_row, first_col, last_col = parse_range(label)
+        rows = [row[first_col - 1:last_col] for row in self.rows[first_row - 1:last_row]]
+        result = {'range': label, 'majorDimension': major}
+        if major == 'COLUMNS':
+            width = max((len(row) for row in rows), default=0)
+            rows = [[row[i] if i < len(row) else '' for row in rows] for i in range(width)]
+        if rows:
+            result['values'] = rows
+        return result
+
+    @staticmethod
+    def _reply(request, status, payload):
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json; charset=UTF-8')
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+
+class RedirectSession(requests.Session):
+    """requests session that sends Sheets API calls to `base_url` instead of Google."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def request(self, method, url, *args, **kwargs):
+        return super().request(method, url.replace(SHEETS_API, self.base_url, 1), *args, **kwargs)
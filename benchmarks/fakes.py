@@ -0,0 +1,80 @@
+import threading
+import time
+
+# ------------------------------
+# IN-PROCESS GSPREAD STAND-INS
+# ------------------------------
+# Just enough of the gspread client/spreadsheet/worksheet surface used by the app
+# (open_by_key().sheet1, append_row(s), col_values, get_values), with optional latency,
+# so benchmarks and local runs never touch the network.
+
+
+class FakeWorksheet:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rows = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def append_row(self, row, **kwargs):
+        self.append_rows([row])
+
+    def append_rows(self, rows, **kwargs):
+        self._call()
+        with self._lock:
+            self.rows.extend([str(value) for value in row] for row in rows)
+
+    def col_values(self, col):
+        self._call()
+        with self._lock:
+            return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+    def get_values(self, range_name=None):
+        self._call()
+        start = 1
+        if range_name:
+            start = int(''.join(ch for ch in range_name.split(':')[0] if ch.isdigit()) or 1)
+        with self._lock:
+            return [list(row) for row in self.rows[start - 1:]]
+
+    def batch_get(self, ranges):
+        """Single-row ranges only (e.g. 'A5:Y5'), as used by the similar-learners panel."""
+        self._call()
+        with self._lock:
+            found = []
+            for range_name in ranges:
+                row = int(''.join(ch for ch in range_name.split(':')[0] if ch.isdigit()))
+                found.append([list(self.rows[row - 1])] if row <= len(self.rows) else [])
+            return found
+
+    def get_all_values(self):
+        return self.get_values()
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.sheet1 = worksheet
+
+
+class FakeClient:
+    """Stands in for an authorized gspread client; every key opens the same worksheet."""
+
+    def __init__(self, latency=0.0):
+        self.worksheet = FakeWorksheet(latency)
+        self.opened = 0
+
+    def open_by_key(self, key):
+        self.opened += 1
+        return FakeSpreadsheet(self.worksheet)
+
+
+def install_fake_client(client):
+    """Make the app's `sheets.authorize` return `client` for the rest of this process."""
+    import sheets
+    sheets.authorize = lambda service_account_info: client
+    return client
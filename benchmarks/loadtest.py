@@ -0,0 +1,295 @@
+"""Concurrent-session load test of the real app against a local Sheets stand-in.
+
+Usage (from the repository root):
+    python -m benchmarks.loadtest --sessions 20 --submissions 3
+    python -m benchmarks.loadtest --sessions 50 --latency 0.3 --error-rate 0.05 --quota 300
+    python -m benchmarks.loadtest --backend outbox --drop-rate 0.1 --json results.json
+
+N simulated sessions run Profiles.py through Streamlit's AppTest harness on threads of one
+process, as sessions do on a real Streamlit server, so they share its cached storage, locks
+and background writers. Each session moves a few sidebar factors, fills in the reflections
+and submits, with some think time in between. Sheets is served by
+benchmarks/fake_sheets_server.py over real HTTP with the configured latency, errors and
+quota. The report covers throughput, rerun and submit latency, lock contention (from the
+app's instrumentation) and lost or duplicated rows. The process exits with status 1 if any
+row was lost or duplicated.
+
+The harness reaches into AppTest internals to share one runtime between sessions (see
+share_apptest_runtime), so it needs a Streamlit whose AppTest has them; it was verified
+against Streamlit 1.65 and exits with a message naming the missing piece on others.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_sheets_server import FakeSheetsServer
+from benchmarks.fakes import install_fake_client
+from scoring import FACTOR_LABELS, SLIDER_VARS
+from storage import SHEET_COLUMNS
+
+APP_PATH = os.path.join(ROOT, 'Profiles.py')
+MARKER_COLUMN = SHEET_COLUMNS.index('key_insights_reflection')
+REFLECTION_KEYS = ['key_insights_reflection', 'sel_focus_reflection',
+                   'teaching_strategies_reflection', 'foundational_domains_reflection']
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+# ------------------------------
+# SHARED APPTEST RUNTIME
+# ------------------------------
+def share_apptest_runtime(secrets):
+    """Let AppTest instances run concurrently on threads of one process.
+
+    Every AppTest run installs a mock Streamlit Runtime, swaps st.secrets and patches the
+    'global.appTest' option, then undoes all three when it finishes, which would pull them out
+    from under runs still in progress on other threads. Instead, they are installed once for
+    the whole process and AppTest's own swapping is pointed at dummies. Each run also compiles the
+    script afresh, and parallel compiles can trip over each other, so all runs share one
+    script cache that compiles once, as a Streamlit server does.
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+    import streamlit as st
+    from streamlit import config
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+        from streamlit.runtime.secrets import Secrets
+        from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+        from streamlit.testing.v1 import app_test, local_script_runner
+    except ImportError as e:
+        raise SystemExit(f"The load test needs Streamlit's AppTest internals (verified on 1.65); "
+                         f"Streamlit {st.__version__} lacks them: {e}")
+    missing = [name for module, name in [(app_test, 'Runtime'), (app_test, 'ScriptCache'),
+                                         (app_test, 'patch_config_options'),
+                                         (local_script_runner, 'ScriptCache')]
+               if not hasattr(module, name)]
+    if missing:
+        raise SystemExit(f"The load test patches AppTest internals that Streamlit {st.__version__} "
+                         f"does not have ({', '.join(missing)}); it was verified on 1.65.")
+    # Only Streamlit versions with bidirectional components give the runtime this registry.
+    try:
+        from streamlit.components.v2.component_manager import BidiComponentManager
+    except ImportError:
+        BidiComponentManager = None
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    if BidiComponentManager is not None:
+        runtime.bidi_component_registry = BidiComponentManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type('RuntimeSlot', (), {'_instance': None})
+
+    script_cache, compile_lock = ScriptCache(), threading.Lock()
+    get_bytecode = script_cache.get_bytecode
+    def get_bytecode_once(script_path):
+        with compile_lock:
+            return get_bytecode(script_path)
+    script_cache.get_bytecode = get_bytecode_once
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    st.secrets = Secrets()
+    st.secrets._secrets = secrets
+
+    config.set_option('global.appTest', True)
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+# ------------------------------
+# SIMULATED SESSION
+# ------------------------------
+class Session:
+    def __init__(self, number, args, rng):
+        self.number, self.args, self.rng = number, args, rng
+        self.rerun_seconds = []
+        self.submit_seconds = []
+        self.submitted = {}  # marker -> wall-clock time of the click
+        self.errors = []
+
+    def _run(self, element, timings):
+        started = time.perf_counter()
+        element.run()
+        timings.append(time.perf_counter() - started)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def _think(self):
+        if self.args.think:
+            time.sleep(self.rng.uniform(0, 2 * self.args.think))
+
+    def __call__(self):
+        from streamlit.testing.v1 import AppTest
+        try:
+            self.at = at = AppTest.from_file(APP_PATH, default_timeout=self.args.timeout)
+            self._run(at, self.rerun_seconds)
+            self._run(at.sidebar.toggle(key='batch_factor_changes').set_value(False), self.rerun_seconds)
+            at.sidebar.text_input(key='user_name').input(f"Load Tester {self.number}")
+            self._run(at.sidebar.text_input(key='subject').input("Load Testing"), self.rerun_seconds)
+            for i in range(self.args.submissions):
+                for var in self.rng.sample(SLIDER_VARS, self.args.moves):
+                    self._think()
+                    self._run(at.sidebar.select_slider(key=var).set_value(self.rng.choice(FACTOR_LABELS[var])), self.rerun_seconds)
+                marker = f"load-test session {self.number} submission {i} {uuid.uuid4().hex}"
+                for key in REFLECTION_KEYS:
+                    at.text_area(key=key).input(marker if key == REFLECTION_KEYS[0] else f"Reflection {i} from session {self.number}")
+                self._run(at, self.rerun_seconds)
+                self._think()
+                clicked = time.time()
+                self._run(at.button[0].click(), self.submit_seconds)
+                self.submitted[marker] = clicked
+        except Exception as e:
+            self.errors.append(f"session {self.number}: {e}")
+
+# ------------------------------
+# REPORT
+# ------------------------------
+def integrity(server, sessions):
+    """Lost and duplicated rows: every submitted marker must be stored exactly once."""
+    stored = {}
+    for row, landed in zip(server.rows, server.append_times):
+        if len(row) > MARKER_COLUMN:
+            stored.setdefault(row[MARKER_COLUMN], []).append(landed)
+    submitted = {marker: clicked for session in sessions for marker, clicked in session.submitted.items()}
+    lost = [marker for marker in submitted if marker not in stored]
+    duplicated = [marker for marker, times in stored.items() if marker in submitted and len(times) > 1]
+    durable = [min(stored[marker]) - clicked for marker, clicked in submitted.items() if marker in stored]
+    return submitted, lost, duplicated, durable
+
+def latency_summary(seconds):
+    return {'count': len(seconds), 'p50_ms': round(percentile(seconds, 50) * 1000, 1),
+            'p99_ms': round(percentile(seconds, 99) * 1000, 1),
+            'mean_ms': round(statistics.fmean(seconds) * 1000, 1) if seconds else 0.0}
+
+def wait_for_rows(server, sessions, timeout):
+    """Give the background writers time to deliver every submission."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, lost, _, _ = integrity(server, sessions)
+        if not lost:
+            return
+        time.sleep(0.25)
+
+def run(args):
+    from instrumentation import REGISTRY, enable
+    enable()
+    server = FakeSheetsServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              drop_rate=args.drop_rate, quota=args.quota, seed=args.seed).start()
+    install_fake_client(server.client())
+    secrets = {'gcp_service_account': {'type': 'service_account'}}
+    if args.backend != 'sheets':
+        secrets['storage'] = {'backend': args.backend, 'path': os.path.join(tempfile.mkdtemp(), 'submissions.db')}
+    share_apptest_runtime(secrets)
+
+    rng = random.Random(args.seed)
+    sessions = [Session(n, args, random.Random(rng.random())) for n in range(args.sessions)]
+    threads = [threading.Thread(target=session, name=f'session-{session.number}') for session in sessions]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if args.ramp:
+            time.sleep(args.ramp / len(threads))
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    wait_for_rows(server, sessions, args.drain_timeout)
+    drained = time.perf_counter() - started
+    server.stop()
+
+    submitted, lost, duplicated, durable = integrity(server, sessions)
+    reruns = [s for session in sessions for s in session.rerun_seconds]
+    submits = [s for session in sessions for s in session.submit_seconds]
+    snapshot = REGISTRY.snapshot()
+    counters = {c['name']: c['value'] for c in snapshot['counters'] if not c['labels']}
+    return {
+        'sessions': args.sessions,
+        'backend': args.backend,
+        'session_seconds': round(elapsed, 2),
+        'drain_seconds': round(drained - elapsed, 2),
+        'reruns_per_second': round((len(reruns) + len(submits)) / elapsed, 1),
+        'submissions_per_second': round(len(submitted) / drained, 2),
+        'rerun': latency_summary(reruns),
+        'submit_click': latency_summary(submits),
+        'submit_to_sheet': latency_summary(durable),
+        'locks': {h['labels'].get('lock', ''): {'acquisitions': h['count'], 'mean_wait_ms': round(h['sum'] / h['count'] * 1000, 3),
+                                                'p99_wait_le_ms': h['p99'] * 1000}
+                  for h in snapshot['histograms'] if h['name'] == 'lock_wait_seconds'},
+        'queue_wait': {f"{h['name']}{''.join(f' {k}={v}' for k, v in h['labels'].items())}":
+                       {'count': h['count'], 'p50_le_ms': h['p50'] * 1000, 'p99_le_ms': h['p99'] * 1000}
+                       for h in snapshot['histograms'] if h['name'] in ('submission_queue_seconds', 'sheets_call_seconds')},
+        'server': dict(server.stats),
+        'sheets_retries': counters.get('sheets_retries_total', 0),
+        'submitted': len(submitted),
+        'stored_rows': len(server.rows),
+        # Rows the writer gave up on; each of those sessions was shown the failure.
+        'failed': counters.get('submissions_failed_total', 0),
+        'lost': len(lost),
+        'duplicated': len(duplicated),
+        'session_errors': [error for session in sessions for error in session.errors],
+    }
+
+def print_report(result):
+    print(f"{result['sessions']} sessions ({result['backend']} backend): {result['session_seconds']}s, "
+          f"then {result['drain_seconds']}s to drain")
+    print(f"throughput: {result['reruns_per_second']} reruns/s, {result['submissions_per_second']} submissions/s")
+    for name in ('rerun', 'submit_click', 'submit_to_sheet'):
+        m = result[name]
+        print(f"{name:16} n={m['count']:<5} p50 {m['p50_ms']:>9,.1f}ms  p99 {m['p99_ms']:>9,.1f}ms  mean {m['mean_ms']:>9,.1f}ms")
+    for lock, m in result['locks'].items():
+        print(f"lock {lock:20} {m['acquisitions']:>6} acquisitions, mean wait {m['mean_wait_ms']:.3f}ms, p99 <= {m['p99_wait_le_ms']:g}ms")
+    for name, m in result['queue_wait'].items():
+        print(f"{name:38} n={m['count']:<5} p50 <= {m['p50_le_ms']:g}ms  p99 <= {m['p99_le_ms']:g}ms")
+    print("server:", ", ".join(f"{k}={v}" for k, v in sorted(result['server'].items())),
+          f"(client retries: {result['sheets_retries']})")
+    print(f"rows: {result['submitted']} submitted, {result['stored_rows']} stored, "
+          f"{result['lost']} lost ({result['failed']} reported to the user as failed), {result['duplicated']} duplicated")
+    for error in result['session_errors']:
+        print("ERROR", error)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with concurrent simulated sessions.")
+    parser.add_argument('--sessions', type=int, default=10, help="concurrent sessions (default: 10)")
+    parser.add_argument('--submissions', type=int, default=3, help="submissions per session (default: 3)")
+    parser.add_argument('--moves', type=int, default=3, help="slider changes before each submission (default: 3)")
+    parser.add_argument('--think', type=float, default=0.2, help="mean think time between actions, seconds (default: 0.2)")
+    parser.add_argument('--ramp', type=float, default=1.0, help="seconds over which sessions start (default: 1)")
+    parser.add_argument('--backend', choices=['sheets', 'outbox'], default='sheets', help="storage backend (default: sheets)")
+    parser.add_argument('--latency', type=float, default=0.1, help="fake Sheets latency per request, seconds (default: 0.1)")
+    parser.add_argument('--jitter', type=float, default=0.05, help="extra random latency, seconds (default: 0.05)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests failing with 503")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of appends applied but never answered")
+    parser.add_argument('--quota', type=int, help="requests allowed per minute before 429s (default: unlimited)")
+    parser.add_argument('--drain-timeout', type=float, default=120.0, help="seconds to wait for queued rows (default: 120)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="per-rerun timeout, seconds (default: 60)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 1 if result['lost'] or result['duplicated'] or result['session_errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""Microbenchmarks for the app's hot paths, with baseline regression gating.
+
+Usage (from the repository root):
+    python -m benchmarks.run                  # run, compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline  # run and record a new baseline
+    python -m benchmarks.run --only script_rerun create_radar_chart --threshold 0.5
+
+Everything runs headlessly: full reruns go through Streamlit's AppTest harness and Google
+Sheets is replaced by the in-process fakes in benchmarks/fakes.py. The process exits with
+status 1 if any tracked metric (median latency, allocations per call) regressed by more than
+the threshold. Baselines are machine-specific; record them on the machine that gates.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from benchmarks.fakes import FakeClient, install_fake_client
+from charts import RADAR_CACHE_SIZE, radar_chart
+from cohort import CODE_COLUMN, CohortCache
+from profile_codec import PROFILE_SPACE
+from reports import profile_key, render_report, report_body, report_sections, section_markdown
+from scoring import ALL_VARS, FACTOR_LABELS, SLIDER_VARS, map_level, score_batch, score_one, profile_name
+from similarity import SimilarityIndex
+
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+TRACKED_METRICS = ('p50_us', 'alloc_kib')
+APP_PATH = os.path.join(ROOT, 'Profiles.py')
+
+BENCHMARKS = {}
+
+
+def benchmark(repeat, threshold=None):
+    """Register a benchmark. The decorated function sets up state and returns the step to time.
+
+    `threshold` overrides the command-line regression threshold for noisy benchmarks.
+    """
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, repeat, threshold)
+        return setup
+    return register
+
+def random_profiles(count, seed=0):
+    rng = random.Random(seed)
+    return [{var: rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS} for _ in range(count)]
+
+# ------------------------------
+# BENCHMARKS
+# ------------------------------
+@benchmark(repeat=2000)
+def calculateCompositeScores():
+    profiles = itertools.cycle(random_profiles(100000))
+    return lambda: score_one(next(profiles))
+
+@benchmark(repeat=2000)
+def determineReadinessProfile():
+    scores = itertools.cycle([score_one(profile) for profile in random_profiles(3000)])
+    return lambda: profile_name(next(scores))
+
+@benchmark(repeat=20)
+def score_batch_100k():
+    rng = np.random.default_rng(0)
+    levels = {var: rng.integers(0, len(FACTOR_LABELS[var]), 100000).astype(np.uint8) for var in ALL_VARS}
+    return lambda: score_batch(levels)
+
+@benchmark(repeat=200)
+def create_radar_chart():
+    # st.plotly_chart serializes the figure on every rerun, so that is part of the cost. Cycling
+    # through more distinct profiles than the figure cache holds keeps every call a miss.
+    profiles = random_profiles(2 * RADAR_CACHE_SIZE)
+    values = itertools.cycle([[map_level(profile[var]) for var in SLIDER_VARS] for profile in profiles])
+    return lambda: radar_chart(next(values)).to_json()
+
+@benchmark(repeat=500)
+def create_radar_chart_hit():
+    profile = random_profiles(1)[0]
+    values = [map_level(profile[var]) for var in SLIDER_VARS]
+    distribution = [(120, 340, 540)] * len(SLIDER_VARS)
+    radar_chart(values, 'quartiles', distribution)
+    return lambda: radar_chart(values, 'quartiles', distribution).to_json()
+
+@benchmark(repeat=1000)
+def generate_downloadable_text_miss():
+    keys = itertools.cycle([profile_key(profile) for profile in random_profiles(3000, seed=1)])
+    def step():
+        for cache in (report_sections, section_markdown, report_body):
+            cache.cache_clear()
+        return render_report(next(keys), "Ada Lovelace", "Mathematics")
+    return step
+
+@benchmark(repeat=2000)
+def generate_downloadable_text_hit():
+    key = profile_key(random_profiles(1)[0])
+    render_report(key, "Ada Lovelace", "Mathematics")
+    return lambda: render_report(key, "Ada Lovelace", "Mathematics")
+
+class _ListSource:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch(self, start):
+        return self.rows[start:]
+
+@benchmark(repeat=500)
+def similarity_query_100k():
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, PROFILE_SPACE, 100000)
+    cohort = CohortCache(_ListSource([[''] * CODE_COLUMN + [str(code)] for code in codes]), min_interval=0)
+    cohort.sync()
+    index = SimilarityIndex(cohort)
+    index.refresh()
+    queries = itertools.cycle(rng.integers(0, PROFILE_SPACE, 100000).tolist())
+    return lambda: index.query(next(queries), k=5, weights={'motivation': 2, 'selfAwareness': 0})
+
+def _share_script_cache():
+    """Compile the script once, as a running server does.
+
+    AppTest builds a fresh ScriptCache for every run, so each rerun would otherwise re-parse
+    Profiles.py and the step's allocations would track the file's length, not the app's work.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    if app_test.ScriptCache is ScriptCache:
+        script_cache = ScriptCache()
+        app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+def _app(client):
+    from streamlit.testing.v1 import AppTest
+    install_fake_client(client)
+    _share_script_cache()
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets['gcp_service_account'] = {'type': 'service_account'}
+    at.run()
+    # Apply slider changes immediately, as a user in the default unbatched mode would.
+    at.sidebar.toggle(key='batch_factor_changes').set_value(False).run()
+    return at
+
+@benchmark(repeat=30, threshold=0.5)
+def script_rerun():
+    at = _app(FakeClient())
+    levels = itertools.cycle(['High', 'Low', 'Medium'])
+    def step():
+        at.sidebar.select_slider(key='openness').set_value(next(levels)).run()
+        assert not at.exception, at.exception
+    return step
+
+@benchmark(repeat=30, threshold=0.5)
+def script_submit():
+    client = FakeClient()
+    at = _app(client)
+    at.sidebar.text_input(key='user_name').input("Ada Lovelace")
+    at.sidebar.text_input(key='subject').input("Mathematics").run()
+    counter = itertools.count()
+    def step():
+        # A fresh reflection each time so the submission key (and the stored row) is new.
+        at.text_area(key='key_insights_reflection').input(f"Reflection {next(counter)}")
+        at.button[0].click().run()
+        assert not at.exception, at.exception
+    return step
+
+# A fresh interpreter per call: imports, content pack loading and the first full script run.
+COLD_START_SCRIPT = f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+from benchmarks.fakes import FakeClient, install_fake_client
+from streamlit.testing.v1 import AppTest
+install_fake_client(FakeClient())
+at = AppTest.from_file({APP_PATH!r}, default_timeout=60)
+at.secrets['gcp_service_account'] = {{'type': 'service_account'}}
+at.run()
+assert not at.exception, at.exception
+"""
+
+@benchmark(repeat=10, threshold=0.5)
+def script_cold_start():
+    # Allocations are in the child process, so only the latency is meaningful here.
+    return lambda: subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], check=True,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# ------------------------------
+# MEASUREMENT
+# ------------------------------
+def measure(step, repeat):
+    """Latency distribution over `repeat` calls, then allocations over a smaller sample."""
+    for _ in range(min(5, repeat)):
+        step()
+    gc.collect()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        step()
+        timings.append((time.perf_counter_ns() - started) / 1000)
+    timings.sort()
+
+    samples = max(3, repeat // 10)
+    allocated = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step()
+            allocated.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(p / 100 * len(timings)))]
+    return {
+        'p50_us': round(percentile(50), 2),
+        'p90_us': round(percentile(90), 2),
+        'p99_us': round(percentile(99), 2),
+        'mean_us': round(statistics.fmean(timings), 2),
+        'alloc_kib': round(statistics.median(allocated), 2),
+        'repeat': repeat,
+    }
+
+def compare(results, baseline, threshold):
+    """List of (benchmark, metric, baseline, current) for every regression beyond the threshold."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric in TRACKED_METRICS:
+            before = baseline.get(name, {}).get(metric)
+            allowed = BENCHMARKS[name][2] if BENCHMARKS[name][2] is not None else threshold
+            if before and metrics[metric] > before * (1 + allowed):
+                regressions.append((name, metric, before, metrics[metric]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the hot-path microbenchmarks.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="record the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative regression (default: 0.25)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every repeat count (e.g. 0.1 for a smoke run)")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        setup, repeat, _ = BENCHMARKS[name]
+        results[name] = measure(setup(), max(3, int(repeat * args.scale)))
+        m = results[name]
+        print(f"{name:34} p50 {m['p50_us']:>11,.1f}us  p90 {m['p90_us']:>11,.1f}us  "
+              f"p99 {m['p99_us']:>11,.1f}us  alloc {m['alloc_kib']:>9,.1f}KiB", flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}.{metric}: {before:,.1f} -> {after:,.1f} (+{after / before - 1:.0%})")
+    if not regressions:
+        print("No regressions beyond the thresholds.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Generate profile reports for a whole roster without the Streamlit UI.
+
+Usage:
+    python bulk_reports.py roster.csv reports.zip
+    python bulk_reports.py roster.jsonl out_dir/ --format markdown --workers 8
+
+Each roster row needs one column per factor (openness, conscientiousness, ..., priorAch) holding
+the same labels as the app's sliders and dropdowns, plus optional `name` and `subject` columns.
+Rows are streamed in chunks to a process pool; at most a few chunks are in flight at once,
+so memory stays flat however long the roster is.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from reports import FORMATS, profile_key, render_report, report_file_name
+from scoring import ALL_VARS, COMPOSITES, FACTOR_LABELS, PROFILES, SEL_VARS, score_batch
+
+LABEL_SETS = {var: set(labels) for var, labels in FACTOR_LABELS.items()}
+SUMMARY_COLUMNS = ['row', 'name', 'subject', 'profile'] + COMPOSITES + SEL_VARS + ['file', 'error']
+# Key of the placeholder row read_roster yields for a line it cannot parse.
+READ_ERROR = '__read_error__'
+
+
+# ------------------------------
+# INPUT
+# ------------------------------
+def read_roster(path, fmt=None):
+    """Yield roster rows as dicts, one at a time. `-` reads from stdin.
+
+    Files may start with a UTF-8 byte order mark (Excel's default for CSV). A JSONL line that is
+    not a JSON object yields a placeholder row carrying the problem, so one bad line costs one
+    row rather than the run.
+    """
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='') if path == '-' else \
+        open(path, newline='', encoding='utf-8-sig')
+    try:
+        if fmt == 'jsonl':
+            for number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {READ_ERROR: f"line {number}: invalid JSON ({e.msg} at column {e.colno})"}
+                    continue
+                yield row if isinstance(row, dict) else \
+                    {READ_ERROR: f"line {number}: expected a JSON object, got {type(row).__name__}"}
+        else:
+            yield from csv.DictReader(stream)
+    finally:
+        if path != '-':
+            stream.close()
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+# ------------------------------
+# WORKER
+# ------------------------------
+def process_chunk(start, rows, fmt):
+    """Score and render one chunk of rows. Runs in a worker process.
+
+    Returns (summary rows, [(file name, report text)]). Rows with missing or unknown factor
+    levels are reported in the summary's error column instead of failing the chunk.
+    """
+    summaries, valid = [None] * len(rows), []
+    for i, row in enumerate(rows):
+        if READ_ERROR in row:
+            summaries[i] = _error_summary(start + i, {}, row[READ_ERROR])
+            continue
+        missing = [var for var in ALL_VARS if not row.get(var)]
+        not_text = [f"{var}={row[var]!r}" for var in ALL_VARS if row.get(var) and not isinstance(row[var], str)]
+        unknown = [f"{var}={row[var]!r}" for var in ALL_VARS
+                   if row.get(var) and isinstance(row[var], str) and row[var] not in LABEL_SETS[var]]
+        if missing or not_text or unknown:
+            problems = [f"missing factors: {', '.join(missing)}"] * bool(missing) + \
+                [f"levels must be text: {', '.join(not_text)}"] * bool(not_text) + \
+                [f"unknown levels: {', '.join(unknown)}"] * bool(unknown)
+            summaries[i] = _error_summary(start + i, row, "; ".join(problems))
+        else:
+            valid.append(i)
+
+    # Every remaining row is known-good, so the whole chunk is scored in one vectorized call.
+    scored = [(valid, score_batch({var: [rows[i][var] for i in valid] for var in ALL_VARS}))] if valid else []
+
+    files = []
+    for indices, batch in scored:
+        for j, i in enumerate(indices):
+            row = rows[i]
+            name, subject = _text(row, 'name'), _text(row, 'subject')
+            file_name = f"{start + i:06d}_{_safe(report_file_name(name, fmt))}"
+            files.append((file_name, render_report(profile_key(row), name, subject, fmt)))
+            summaries[i] = [start + i, name, subject, PROFILES[batch['profile'][j]]] + \
+                [int(batch[key][j]) for key in COMPOSITES + SEL_VARS] + [file_name, '']
+    return summaries, files
+
+def _text(row, column):
+    """Optional free-text column; JSON numbers (e.g. a subject code) are kept as text."""
+    value = row.get(column)
+    return '' if value is None else str(value)
+
+def _error_summary(index, row, message):
+    return [index, _text(row, 'name'), _text(row, 'subject'), ''] + [''] * len(COMPOSITES + SEL_VARS) + ['', message]
+
+def _safe(file_name):
+    return re.sub(r'[^\w.-]', '_', file_name)
+
+# ------------------------------
+# OUTPUT
+# ------------------------------
+class ReportWriter:
+    """Writes reports into a zip archive (if the path ends in .zip) or a directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = None
+        if path.endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            os.makedirs(path, exist_ok=True)
+        # One line per student, spooled to disk so memory stays flat for very long rosters.
+        self._summary_file = tempfile.TemporaryFile()
+        self._summary_text = io.TextIOWrapper(self._summary_file, encoding='utf-8', newline='')
+        self._summary = csv.writer(self._summary_text)
+        self._summary.writerow(SUMMARY_COLUMNS)
+
+    def write(self, summaries, files):
+        for file_name, text in files:
+            if self._zip:
+                self._zip.writestr(file_name, text)
+            else:
+                with open(os.path.join(self.path, file_name), 'w', encoding='utf-8') as f:
+                    f.write(text)
+        self._summary.writerows(summaries)
+
+    def close(self):
+        self._summary_text.flush()
+        self._summary_file.seek(0)
+        if self._zip:
+            with self._zip.open('summary.csv', 'w') as f:
+                shutil.copyfileobj(self._summary_file, f)
+            self._zip.close()
+        else:
+            with open(os.path.join(self.path, 'summary.csv'), 'wb') as f:
+                shutil.copyfileobj(self._summary_file, f)
+        self._summary_text.close()
+
+# ------------------------------
+# MAIN
+# ------------------------------
+def run(roster, output, fmt='txt', input_format=None, workers=None, chunk_size=500, progress=sys.stderr):
+    """Generate every report; returns (rows processed, rows with errors)."""
+    workers = workers or os.cpu_count() or 1
+    writer = ReportWriter(output)
+    processed = errors = 0
+    started = time.perf_counter()
+
+    def collect(future):
+        nonlocal processed, errors
+        summaries, files = future.result()
+        writer.write(summaries, files)
+        processed += len(summaries)
+        errors += sum(1 for summary in summaries if summary[-1])
+        if progress:
+            rate = processed / max(time.perf_counter() - started, 1e-9)
+            print(f"\r{processed} rows processed ({rate:,.0f} rows/s, {errors} errors)", end='', file=progress, flush=True)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Collected oldest first, so summary.csv and the archive follow the roster's order.
+            in_flight = deque()
+            for index, rows in enumerate(chunked(read_roster(roster, input_format), chunk_size)):
+                # Bounded fan-out: wait for a result before reading further than 2 chunks per worker.
+                if len(in_flight) >= 2 * workers:
+                    collect(in_flight.popleft())
+                in_flight.append(pool.submit(process_chunk, index * chunk_size, rows, fmt))
+            while in_flight:
+                collect(in_flight.popleft())
+    finally:
+        writer.close()
+    if progress:
+        print(file=progress)
+    return processed, errors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate profile summary reports for a roster of students.")
+    parser.add_argument('roster', help="CSV or JSONL file with one student per row ('-' for stdin)")
+    parser.add_argument('output', help="output .zip archive or directory")
+    parser.add_argument('--format', dest='fmt', choices=list(FORMATS), default='txt', help="report format (default: txt)")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help="roster format (default: from the file extension)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="rows per task (default: 500)")
+    parser.add_argument('--quiet', action='store_true', help="no progress output")
+    args = parser.parse_args(argv)
+
+    processed, errors = run(args.roster, args.output, args.fmt, args.input_format, args.workers,
+                            args.chunk_size, progress=None if args.quiet else sys.stderr)
+    print(f"Wrote {processed - errors} reports to {args.output}" + (f" ({errors} rows skipped, see summary.csv)" if errors else ""),
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+from scoring import SLIDER_VARS, level_mapping
+
+# ------------------------------
+# RADAR CHART
+# ------------------------------
+# The axes, labels and layout never change, so the layout is validated once and every figure
+# is assembled from it. Each axis takes one of three values, so figures are also cached per
+# distinct slider tuple (and overlay); a rerun with an unchanged profile reuses its figure.
+# Cohort overlays are drawn from per-axis level counts, never from individual students, so the
+# figure stays the same size for a cohort of ten or of a hundred thousand.
+
+RADAR_LABELS = [var.replace('self', 'Self ').replace('social', 'Social ').capitalize() for var in SLIDER_VARS]
+RADAR_CACHE_SIZE = 1024
+LEVEL_POINTS = list(level_mapping.values())
+# None draws the student alone.
+OVERLAYS = (None, 'median', 'quartiles', 'density')
+
+COHORT_COLOR = 'rgba(120, 120, 120, {alpha})'
+
+
+@lru_cache(maxsize=1)
+def _layout():
+    """Plain-dict layout shared by every radar chart, validated by plotly once per process."""
+    import plotly.graph_objects as go
+    return go.Layout(polar=dict(radialaxis=dict(visible=True, range=[0, 100])), showlegend=False).to_plotly_json()
+
+def _closed(values):
+    """Close the polygon so the outline joins the last axis back to the first."""
+    return list(values) + [values[0]], RADAR_LABELS + [RADAR_LABELS[0]]
+
+def level_quantile(counts, q):
+    """Points (25/50/75) of the level holding the q-quantile of one axis' Low/Medium/High counts."""
+    total, seen = sum(counts), 0
+    for points, count in zip(LEVEL_POINTS, counts):
+        seen += count
+        if seen >= q * total:
+            return points
+    return LEVEL_POINTS[-1]
+
+def _overlay_traces(overlay, distribution):
+    """Cohort traces (drawn beneath the student) from per-axis level counts."""
+    if overlay == 'density':
+        r, theta, size, text = [], [], [], []
+        for label, counts in zip(RADAR_LABELS, distribution):
+            total = sum(counts) or 1
+            for level, points, count in zip(level_mapping, LEVEL_POINTS, counts):
+                r.append(points)
+                theta.append(label)
+                size.append(4 + 26 * (count / total) ** 0.5)
+                text.append(f"{label} {level}: {count / total:.0%} of cohort")
+        return [{'type': 'scatterpolar', 'mode': 'markers', 'r': r, 'theta': theta, 'text': text,
+                 'hoverinfo': 'text', 'name': 'Cohort', 'marker': {'size': size, 'color': COHORT_COLOR.format(alpha=0.45)}}]
+
+    traces = []
+    if overlay == 'quartiles':
+        lower, theta = _closed([level_quantile(counts, 0.25) for counts in distribution])
+        upper, _ = _closed([level_quantile(counts, 0.75) for counts in distribution])
+        traces.append({'type': 'scatterpolar', 'r': lower, 'theta': theta, 'mode': 'lines',
+                       'line': {'width': 0}, 'hoverinfo': 'skip', 'name': 'Cohort Q1'})
+        traces.append({'type': 'scatterpolar', 'r': upper, 'theta': theta, 'mode': 'lines', 'fill': 'tonext',
+                       'fillcolor': COHORT_COLOR.format(alpha=0.25), 'line': {'width': 0}, 'name': 'Cohort Q1–Q3'})
+    median, theta = _closed([level_quantile(counts, 0.5) for counts in distribution])
+    traces.append({'type': 'scatterpolar', 'r': median, 'theta': theta, 'mode': 'lines', 'name': 'Cohort median',
+                   'line': {'color': COHORT_COLOR.format(alpha=0.9), 'dash': 'dash'}})
+    return traces
+
+@lru_cache(maxsize=RADAR_CACHE_SIZE)
+def _radar_figure(values, overlay, distribution):
+    import plotly.graph_objects as go
+    traces = _overlay_traces(overlay, distribution) if overlay and distribution else []
+    traces.append({'type': 'scatterpolar', 'r': list(values), 'theta': RADAR_LABELS, 'fill': 'toself', 'name': 'Profile'})
+    return go.Figure({'data': traces, 'layout': _layout()})
+
+def radar_chart(values, overlay=None, distribution=None):
+    """Radar chart of the 11 slider factors, given their points (25/50/75) in SLIDER_VARS order.
+
+    `overlay` is one of OVERLAYS; `distribution` holds each slider's (Low, Medium, High) cohort
+    counts in SLIDER_VARS order (see CohortCache.slider_distribution). The returned figure is
+    shared through a cache: pass it to st.plotly_chart or serialize it, but do not modify it.
+    """
+    if overlay not in OVERLAYS:
+        raise ValueError(f"Unknown radar overlay '{overlay}'. Use one of {OVERLAYS[1:]}.")
+    return _radar_figure(tuple(values), overlay, tuple(map(tuple, distribution)) if distribution else None)
+
+def cache_stats():
+    return _radar_figure.cache_info()._asdict()
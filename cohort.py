@@ -0,0 +1,198 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import timed
+from profile_codec import unpack, encode_profile, readiness_lookup, PROFILE_SPACE
+from scoring import ALL_VARS, COMPOSITES, FACTOR_LABELS, PROFILES, SLIDER_VARS, composite_scores
+from storage import SHEET_COLUMNS
+
+# ------------------------------
+# INCREMENTAL COHORT ANALYTICS
+# ------------------------------
+# Past submissions are reduced to one uint32 profile code per row (see profile_codec), held
+# in a growable in-memory column and optionally persisted as Parquet part files. Each sync
+# fetches only rows past the last one seen and folds them into running aggregates, so a
+# 100k-row cohort costs only its new rows to refresh.
+
+FACTORS_START = SHEET_COLUMNS.index(ALL_VARS[0])
+CODE_COLUMN = SHEET_COLUMNS.index('profile_code')
+
+
+def row_code(row):
+    """Profile code for a stored row, or None for headers and malformed rows."""
+    if len(row) > CODE_COLUMN:
+        try:
+            code = int(row[CODE_COLUMN])
+            if 0 <= code < PROFILE_SPACE:
+                return code
+        except (TypeError, ValueError):
+            pass
+    # Rows written before the profile-code column existed: encode their labels instead.
+    try:
+        return encode_profile(dict(zip(ALL_VARS, row[FACTORS_START:FACTORS_START + len(ALL_VARS)])))
+    except (ValueError, KeyError):
+        return None
+
+# ------------------------------
+# ROW SOURCES
+# ------------------------------
+class SheetsRowSource:
+    """Reads rows past a given index from the worksheet behind a WorksheetHandle."""
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._last_column = chr(ord('A') + len(SHEET_COLUMNS) - 1)
+
+    def fetch(self, start):
+        import gspread
+        worksheet = self._handle.get()
+        try:
+            with timed('sheets_call_seconds', op='get_values'):
+                return worksheet.get_values(f"A{start + 1}:{self._last_column}")
+        except gspread.exceptions.APIError as e:
+            # Appends grow the grid to exactly the rows written, so once a sheet is past its
+            # initial 1000 rows, asking for the rows after the last one is out of the grid.
+            if getattr(e.response, 'status_code', None) == 400 and 'exceeds grid limits' in str(e):
+                return []
+            raise
+
+    def fetch_rows(self, indices):
+        """The rows at the given 0-based indices, in one batched read."""
+        if not indices:
+            return []
+        worksheet = self._handle.get()
+        with timed('sheets_call_seconds', op='batch_get'):
+            ranges = worksheet.batch_get([f"A{i + 1}:{self._last_column}{i + 1}" for i in indices])
+        return [found[0] if found else [] for found in ranges]
+
+
+class SQLiteRowSource:
+    """Reads rows past a given index from a SQLiteStorage (or an outbox's database)."""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def fetch(self, start):
+        return self._storage.rows(start)
+
+    def fetch_rows(self, indices):
+        return [(self._storage.rows(i, 1) or [[]])[0] for i in indices]
+
+# ------------------------------
+# COHORT CACHE
+# ------------------------------
+class CohortCache:
+    """Profile codes and running aggregates for every row seen so far."""
+
+    def __init__(self, source, snapshot_dir=None, min_interval=30.0):
+        self._source = source
+        self.snapshot_dir = snapshot_dir
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._codes = np.empty(1024, dtype=np.uint32)
+        self._rows = np.empty(1024, dtype=np.int64)  # source row index of each code (-1 if unknown)
+        self.size = 0          # valid profiles held
+        self.rows_seen = 0     # source rows consumed, including skipped ones
+        self.last_sync = 0.0
+        self.profile_counts = np.zeros(len(PROFILES), dtype=np.int64)
+        self.composite_sums = {name: 0 for name in COMPOSITES}
+        self.level_counts = {var: np.zeros(len(FACTOR_LABELS[var]), dtype=np.int64) for var in ALL_VARS}
+        if snapshot_dir:
+            self._load_snapshot()
+
+    @property
+    def codes(self):
+        """Read-only view of every profile code in the cohort."""
+        view = self._codes[:self.size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def rows(self):
+        """Read-only view of the source row index behind each code, aligned with `codes`."""
+        view = self._rows[:self.size]
+        view.flags.writeable = False
+        return view
+
+    def fetch_rows(self, indices):
+        """Full stored rows (names, reflections, ...) for the given source row indices."""
+        return self._source.fetch_rows([int(i) for i in indices])
+
+    def sync(self, force=False):
+        """Fetch and fold in rows added since the last sync. Returns how many were new."""
+        with self._lock:
+            if not force and time.monotonic() - self.last_sync < self.min_interval:
+                return 0
+            rows = self._source.fetch(self.rows_seen)
+            self.last_sync = time.monotonic()
+            if not rows:
+                return 0
+            found = [(self.rows_seen + i, code) for i, code in enumerate(map(row_code, rows)) if code is not None]
+            indices = np.array([i for i, _ in found], dtype=np.int64)
+            codes = np.array([code for _, code in found], dtype=np.uint32)
+            if self.snapshot_dir:
+                self._write_part(self.rows_seen, len(rows), codes, indices)
+            self.rows_seen += len(rows)
+            self._add(codes, indices)
+            return len(rows)
+
+    def summary(self):
+        """Counts, means and histograms in display form."""
+        with self._lock:
+            total = self.size
+            return {
+                'total': total,
+                'profiles': dict(zip(PROFILES, self.profile_counts.tolist())),
+                'composite_means': {name: (self.composite_sums[name] / total if total else 0.0) for name in COMPOSITES},
+                'levels': {var: dict(zip(FACTOR_LABELS[var], counts.tolist())) for var, counts in self.level_counts.items()},
+            }
+
+    def slider_distribution(self):
+        """(Low, Medium, High) counts per slider factor in SLIDER_VARS order, e.g. for a radar overlay."""
+        with self._lock:
+            return tuple(tuple(self.level_counts[var].tolist()) for var in SLIDER_VARS)
+
+    def _add(self, codes, indices):
+        if not len(codes):
+            return
+        needed = self.size + len(codes)
+        if needed > len(self._codes):
+            capacity = max(needed, 2 * len(self._codes))
+            grown_codes, grown_rows = np.empty(capacity, dtype=np.uint32), np.empty(capacity, dtype=np.int64)
+            grown_codes[:self.size], grown_rows[:self.size] = self._codes[:self.size], self._rows[:self.size]
+            self._codes, self._rows = grown_codes, grown_rows
+        self._codes[self.size:needed] = codes
+        self._rows[self.size:needed] = indices
+        self.size = needed
+
+        # Only the new rows are scored; the aggregates are running totals.
+        levels = unpack(codes)
+        scores = composite_scores(levels)
+        self.profile_counts += np.bincount(readiness_lookup(codes), minlength=len(PROFILES))
+        for name in COMPOSITES:
+            self.composite_sums[name] += int(scores[name].sum(dtype=np.int64))
+        for var in ALL_VARS:
+            self.level_counts[var] += np.bincount(levels[var], minlength=len(FACTOR_LABELS[var]))
+
+    # --- Parquet snapshot: one part file per sync, named by its first source row ---
+    def _write_part(self, start, row_count, codes, indices):
+        import pandas as pd
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, f"part-{start:010d}-{row_count:08d}.parquet")
+        pd.DataFrame({'profile_code': codes, 'row': indices}).to_parquet(path, index=False)
+
+    def _load_snapshot(self):
+        import pandas as pd
+        for path in sorted(glob.glob(os.path.join(self.snapshot_dir, "part-*.parquet"))):
+            start, row_count = (int(part) for part in os.path.basename(path)[5:-8].split('-'))
+            if start != self.rows_seen:
+                break  # a gap means later parts cannot be trusted; re-fetch from here
+            part = pd.read_parquet(path)
+            # Parts written before row indices were recorded cannot point back at their rows.
+            indices = part['row'].to_numpy(dtype=np.int64) if 'row' in part else np.full(len(part), -1, dtype=np.int64)
+            self._add(part['profile_code'].to_numpy(dtype=np.uint32), indices)
+            self.rows_seen = start + row_count
@@ -0,0 +1,87 @@
+import json
+import os
+from types import MappingProxyType
+
+from scoring import SLIDER_VARS, CATEGORICAL_VARS, ALL_VARS, COMPOSITES, SEL_VARS, PROFILES, categorical_mappings, level_mapping
+
+# ------------------------------
+# REPORT CONTENT
+# ------------------------------
+# Static text shown in the interpretation section and the downloadable report. It lives in a
+# versioned content pack (content_pack.json, or the file named by PROFILES_CONTENT_PACK) that
+# is parsed and validated once per process when this module is first imported. Every session
+# then shares the same read-only mappings; a rerun only looks things up.
+
+CONTENT_PACK_PATH = os.environ.get(
+    'PROFILES_CONTENT_PACK', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content_pack.json'))
+SUPPORTED_VERSIONS = {1}
+
+
+def _freeze(value):
+    """Read-only copy of parsed JSON: dicts become mapping proxies, lists become tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _missing(mapping, keys):
+    return [key for key in keys if not isinstance(mapping.get(key), str)]
+
+def validate_pack(pack):
+    """List of problems that would break a report (empty when the pack is usable)."""
+    if pack.get('version') not in SUPPORTED_VERSIONS:
+        return [f"unsupported content pack version {pack.get('version')!r} (supported: {sorted(SUPPORTED_VERSIONS)})"]
+    sections = ('definitions', 'profile_descriptions', 'teaching_strategies', 'categorical_strategies',
+                'detailed_explanations', 'support_texts', 'composite_names', 'sel_names')
+    problems = [f"missing section '{name}'" for name in sections if not isinstance(pack.get(name), dict)]
+    if problems:
+        return problems
+
+    checks = [
+        ('definitions', pack['definitions'], ALL_VARS),
+        ('profile_descriptions', pack['profile_descriptions'], PROFILES),
+        ('support_texts', pack['support_texts'], PROFILES),
+        ('composite_names', pack['composite_names'], COMPOSITES),
+        ('sel_names', pack['sel_names'], SEL_VARS),
+    ]
+    for var in SLIDER_VARS:
+        checks.append((f"teaching_strategies.{var}", pack['teaching_strategies'].get(var, {}), level_mapping))
+    for var in CATEGORICAL_VARS:
+        checks.append((f"categorical_strategies.{var}", pack['categorical_strategies'].get(var, {}), categorical_mappings[var]))
+    explanations = pack['detailed_explanations']
+    checks.append(("detailed_explanations.key_insights", explanations.get('key_insights', {}),
+                   ['header'] + list(pack['composite_names'].values())))
+    checks.append(("detailed_explanations.sel_focus", explanations.get('sel_focus', {}),
+                   ['header'] + list(pack['sel_names'].values())))
+
+    for where, mapping, keys in checks:
+        if not isinstance(mapping, dict):
+            problems.append(f"{where} must be an object")
+            continue
+        problems += [f"{where} has no text for '{key}'" for key in _missing(mapping, keys)]
+    return problems
+
+def load_pack(path=CONTENT_PACK_PATH):
+    """Parse, validate and freeze a content pack. Raises ValueError if it is unusable."""
+    with open(path, encoding='utf-8') as f:
+        pack = json.load(f)
+    problems = validate_pack(pack)
+    if problems:
+        raise ValueError(f"Invalid content pack {path}: " + "; ".join(problems))
+    return _freeze(pack)
+
+PACK = load_pack()
+CONTENT_VERSION = PACK['version']
+
+definitions = PACK['definitions']
+profile_descriptions = PACK['profile_descriptions']
+teaching_strategies = PACK['teaching_strategies']
+categorical_strategies = PACK['categorical_strategies']
+# Psychological explanations for the composite and SEL scores, keyed by display name
+detailed_explanations = PACK['detailed_explanations']
+# Cognitive development supports for each readiness profile
+support_texts = PACK['support_texts']
+# Display names for the composite and SEL scores, in report order
+composite_names = PACK['composite_names']
+sel_names = PACK['sel_names']
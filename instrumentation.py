@@ -0,0 +1,218 @@
+import bisect
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+# ------------------------------
+# HOT-PATH INSTRUMENTATION
+# ------------------------------
+# Timing spans, latency histograms and counters for the script and the submission path.
+# Collection is off unless PROFILES_METRICS=1 (or something calls `enable()`, e.g. an operator
+# in the diagnostics panel); while off, `span()` and `timed()` hand back one shared no-op
+# context manager, so instrumented code pays a function call and nothing else.
+#
+# Exports: `prometheus_text()` (text exposition format), written to PROFILES_METRICS_FILE at
+# most every PROFILES_METRICS_INTERVAL seconds if set, and one JSON log line per rerun on the
+# "profiles.metrics" logger when PROFILES_METRICS_LOG=1.
+
+PREFIX = 'profiles_'
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_TRUTHY = ('1', 'true', 'yes', 'on')
+_enabled = os.environ.get('PROFILES_METRICS', '').lower() in _TRUTHY
+_log_reruns = os.environ.get('PROFILES_METRICS_LOG', '').lower() in _TRUTHY
+_export_path = os.environ.get('PROFILES_METRICS_FILE')
+_export_interval = float(os.environ.get('PROFILES_METRICS_INTERVAL', '15'))
+_last_export = 0.0
+_local = threading.local()
+_NOOP = contextlib.nullcontext()
+
+logger = logging.getLogger('profiles.metrics')
+
+
+def enabled():
+    return _enabled
+
+def enable():
+    """Turn collection on for this process (it stays on)."""
+    global _enabled
+    _enabled = True
+
+# ------------------------------
+# REGISTRY
+# ------------------------------
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (the usual histogram estimate)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.counters = {}    # (name, labels) -> float
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """Plain-data copy: {'histograms': [...], 'counters': [...]}."""
+        with self._lock:
+            return {
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                     'p50': h.quantile(0.5), 'p99': h.quantile(0.99)}
+                    for (name, labels), h in sorted(self.histograms.items())],
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())],
+            }
+
+    def prometheus_text(self):
+        def label_text(labels, extra=()):
+            pairs = [f'{k}="{str(v)}"' for k, v in labels + tuple(extra)]
+            return '{' + ','.join(pairs) + '}' if pairs else ''
+
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{label_text(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), h.counts):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{label_text(labels)} {h.sum}")
+                lines.append(f"{PREFIX}{name}_count{label_text(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+
+def inc(name, amount=1, **labels):
+    if _enabled:
+        REGISTRY.inc(name, amount, **labels)
+
+def observe(name, value, **labels):
+    if _enabled:
+        REGISTRY.observe(name, value, **labels)
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+# ------------------------------
+# SPANS & TIMERS
+# ------------------------------
+class _Timer:
+    __slots__ = ('name', 'labels', 'started', 'stage')
+
+    def __init__(self, name, labels, stage=None):
+        self.name, self.labels, self.stage = name, labels, stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        REGISTRY.observe(self.name, elapsed, **self.labels)
+        if self.stage is not None:
+            spans = getattr(_local, 'spans', None)
+            if spans is not None:
+                spans[self.stage] = elapsed
+        return False
+
+def span(stage):
+    """Time one stage of the script; also kept as the latest value for this session's rerun."""
+    return _Timer('stage_seconds', {'stage': stage}, stage) if _enabled else _NOOP
+
+def timed(metric, **labels):
+    """Time anything else into histogram `metric`, e.g. timed('sheets_call_seconds', op='append_rows')."""
+    return _Timer(metric, labels) if _enabled else _NOOP
+
+@contextlib.contextmanager
+def _acquired(lock, name):
+    started = time.perf_counter()
+    with lock:
+        REGISTRY.observe('lock_wait_seconds', time.perf_counter() - started, lock=name)
+        yield
+
+def acquire(lock, name):
+    """`with acquire(lock, 'name'):` holds `lock`, recording how long acquiring it took."""
+    return _acquired(lock, name) if _enabled else lock
+
+# ------------------------------
+# PER-RERUN BOOKKEEPING
+# ------------------------------
+def begin_rerun():
+    """Call at the top of the script. Starts the per-rerun span table for this thread."""
+    if not _enabled:
+        return
+    _local.spans = {}
+    _local.started = time.perf_counter()
+    REGISTRY.inc('reruns_total')
+
+def end_rerun():
+    """Call at the bottom of the script: records the total and runs the configured exports."""
+    global _last_export
+    if not _enabled or getattr(_local, 'started', None) is None:
+        return
+    total = time.perf_counter() - _local.started
+    _local.spans['rerun'] = total
+    _local.started = None
+    REGISTRY.observe('stage_seconds', total, stage='rerun')
+    if _log_reruns:
+        logger.info(json.dumps({'event': 'rerun', 'spans_ms': {k: round(v * 1000, 3) for k, v in _local.spans.items()}}))
+    if _export_path and time.monotonic() - _last_export >= _export_interval:
+        _last_export = time.monotonic()
+        write_prometheus(_export_path)
+
+def last_rerun_spans():
+    """{stage: seconds} for the most recent rerun (and fragment reruns) on this thread."""
+    return dict(getattr(_local, 'spans', None) or {})
+
+def write_prometheus(path):
+    """Atomically write the Prometheus text file (e.g. for node_exporter's textfile collector)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
@@ -0,0 +1,96 @@
+import base64
+
+import numpy as np
+
+from scoring import ALL_VARS, FACTOR_LABELS, PROFILES, SEL_VARS, readiness_profiles, composite_scores
+
+# ------------------------------
+# COMPACT PROFILE ENCODING
+# ------------------------------
+# A full profile (11 three-level sliders + 4 small categoricals) is a mixed-radix number
+# below 19,131,876, so it fits in 25 bits. The factors the readiness profile depends on are
+# the low-order digits, which makes `code % READINESS_SIZE` an index into a lookup table.
+
+READINESS_VARS = [var for var in ALL_VARS if var not in SEL_VARS]
+CODE_VARS = READINESS_VARS + SEL_VARS  # least significant digit first
+
+RADICES = [len(FACTOR_LABELS[var]) for var in CODE_VARS]
+READINESS_SIZE = int(np.prod(RADICES[:len(READINESS_VARS)]))
+PROFILE_SPACE = int(np.prod(RADICES))
+
+TOKEN_BYTES = 4  # 25 bits rounded up to whole bytes -> a 6-character token
+
+
+def pack(levels):
+    """Pack level-index arrays (var -> indices) into uint32 profile codes."""
+    codes = np.zeros(np.shape(levels[CODE_VARS[0]]), dtype=np.uint32)
+    for var, radix in zip(reversed(CODE_VARS), reversed(RADICES)):
+        codes = codes * radix + np.asarray(levels[var], dtype=np.uint32)
+    return codes
+
+def unpack(codes):
+    """Inverse of `pack`: uint32 profile codes to a dict of level-index arrays."""
+    codes = np.asarray(codes, dtype=np.uint32)
+    if (codes >= PROFILE_SPACE).any():
+        raise ValueError("Profile code out of range.")
+    levels = {}
+    for var, radix in zip(CODE_VARS, RADICES):
+        codes, levels[var] = np.divmod(codes, radix)
+        levels[var] = levels[var].astype(np.uint8)
+    return levels
+
+def encode_profile(factors):
+    """Profile code for one profile given as labels, e.g. taken from session state."""
+    code = 0
+    for var, radix in zip(reversed(CODE_VARS), reversed(RADICES)):
+        code = code * radix + FACTOR_LABELS[var].index(factors[var])
+    return code
+
+def decode_profile(code):
+    """Labels for every factor in ALL_VARS from a single profile code."""
+    if not 0 <= code < PROFILE_SPACE:
+        raise ValueError("Profile code out of range.")
+    factors = {}
+    for var, radix in zip(CODE_VARS, RADICES):
+        code, index = divmod(code, radix)
+        factors[var] = FACTOR_LABELS[var][index]
+    return {var: factors[var] for var in ALL_VARS}
+
+# ------------------------------
+# SHAREABLE TOKENS
+# ------------------------------
+def to_token(code):
+    """Short URL-safe token for a profile code (6 characters)."""
+    return base64.urlsafe_b64encode(int(code).to_bytes(TOKEN_BYTES, 'big')).decode().rstrip('=')
+
+def from_token(token):
+    """Profile code from a token; raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token.strip() + '=' * (-len(token.strip()) % 4))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid profile token {token!r}.") from None
+    code = int.from_bytes(raw, 'big')
+    if len(raw) != TOKEN_BYTES or code >= PROFILE_SPACE:
+        raise ValueError(f"Invalid profile token {token!r}.")
+    return code
+
+# ------------------------------
+# READINESS LOOKUP TABLE
+# ------------------------------
+def _build_readiness_table():
+    """Profile index for every combination of READINESS_VARS, scored by the engine once."""
+    levels = unpack(np.arange(READINESS_SIZE, dtype=np.uint32))
+    # SEL factors do not affect readiness; their digits are zero across this range.
+    return readiness_profiles(composite_scores(levels))
+
+READINESS_TABLE = _build_readiness_table()
+READINESS_TABLE.setflags(write=False)
+
+
+def readiness_lookup(codes):
+    """PROFILES index for each profile code: one modulo and one array index."""
+    return READINESS_TABLE[np.asarray(codes, dtype=np.uint32) % READINESS_SIZE]
+
+def profile_for_code(code):
+    """Readiness profile name for a single profile code."""
+    return PROFILES[READINESS_TABLE[code % READINESS_SIZE]]
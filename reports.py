@@ -0,0 +1,153 @@
+import html
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from content import (
+    profile_descriptions, teaching_strategies, categorical_strategies,
+    detailed_explanations, support_texts, composite_names, sel_names
+)
+from scoring import ALL_VARS, SLIDER_VARS, CATEGORICAL_VARS, getLevel, score_one, profile_name
+
+# ------------------------------
+# MEMOIZED REPORT RENDERING
+# ------------------------------
+# A report is a pure function of the 15 factor values, and there are only ~19M possible
+# profiles (far fewer in practice). Rendered fragments are cached per profile tuple; the
+# name/subject header is the only per-user part and is prepended separately.
+
+REPORT_CACHE_SIZE = 4096
+FORMATS = {'txt': ('txt', 'text/plain'), 'markdown': ('md', 'text/markdown'), 'html': ('html', 'text/html')}
+
+# One report section: title, intro paragraph, and (label, level, text) items.
+Section = namedtuple('Section', 'title intro items')
+
+
+def profile_key(factors):
+    """Hashable cache key for a profile: its factor labels in ALL_VARS order."""
+    return tuple(factors[var] for var in ALL_VARS)
+
+# ------------------------------
+# FRAGMENTS
+# ------------------------------
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def report_sections(key):
+    """Profile name and report sections for a profile key, built once per distinct profile."""
+    factors = dict(zip(ALL_VARS, key))
+    scores = score_one(factors)
+    profile = profile_name(scores)
+    insights = detailed_explanations['key_insights']
+    sel = detailed_explanations['sel_focus']
+    sections = {
+        'key_insights': Section("Key Insights & Psychological Meaning", insights['header'], tuple(
+            (name, getLevel(scores[var]).capitalize(), insights[name]) for var, name in composite_names.items())),
+        'sel_focus': Section("SEL Focus (CASEL) & Psychological Meaning", sel['header'], tuple(
+            (name, getLevel(scores[var]).capitalize(), sel[name]) for var, name in sel_names.items())),
+        'teaching_strategies': Section("Recommended Teaching Strategies", '', tuple(
+            (var.capitalize(), None, teaching_strategies[var][factors[var]]) for var in SLIDER_VARS)),
+        'foundational_domains': Section("Strategies for Foundational Domains", '', tuple(
+            (f"{var.capitalize()} ({factors[var]})", None, categorical_strategies[var][factors[var]]) for var in CATEGORICAL_VARS)),
+        'cognitive_supports': Section("Cognitive Development Supports", support_texts.get(profile, ""), ()),
+    }
+    return profile, sections
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def section_markdown(key):
+    """Markdown body of each section, as shown in the expanders of the interpretation view."""
+    _, sections = report_sections(key)
+    rendered = {}
+    for name, section in sections.items():
+        lines = []
+        for label, level, text in section.items:
+            if level is None:
+                lines.append(f"**{label}:** {text}")
+            else:
+                lines.append(f"**{label}:** `{level}`\n\n{text}")
+        rendered[name] = "\n\n".join(lines)
+    return rendered
+
+# ------------------------------
+# FULL REPORTS
+# ------------------------------
+def _report_txt(key):
+    # Same layout the download button has always produced (the header is added separately).
+    profile, sections = report_sections(key)
+    parts = [f"READINESS PROFILE: {profile}", f"{profile_descriptions[profile]}\n"]
+    for name in ('key_insights', 'sel_focus'):
+        section = sections[name]
+        lines = [f"--- {section.title} ---\n{section.intro}\n"]
+        for label, level, text in section.items:
+            lines.append(f"**{label}:** {level}")
+            lines.append(f"{text}\n")
+        parts.append("\n".join(lines))
+    section = sections['teaching_strategies']
+    parts.append("\n".join([f"--- {section.title} ---\n"] + [f"**{label}:** {text}" for label, _, text in section.items]))
+    return "\n".join(parts)
+
+def _report_markdown(key):
+    profile, sections = report_sections(key)
+    bodies = section_markdown(key)
+    parts = [f"## {profile}", f"_{profile_descriptions[profile]}_"]
+    for name, section in sections.items():
+        parts.append(f"### {section.title}")
+        if section.intro:
+            parts.append(section.intro)
+        if bodies[name]:
+            parts.append(bodies[name])
+    return "\n\n".join(parts) + "\n"
+
+def _inline_html(text):
+    """Escape text and convert the **bold**, _italic_ and `code` markup used in the content."""
+    text = html.escape(text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"`(.+?)`", r"<code>\1</code>", text)
+    return re.sub(r"(?<!\w)_(.+?)_(?!\w)", r"<em>\1</em>", text)
+
+def _report_html(key):
+    profile, sections = report_sections(key)
+    parts = [f"<h2>{html.escape(profile)}</h2>", f"<p><em>{_inline_html(profile_descriptions[profile])}</em></p>"]
+    for section in sections.values():
+        parts.append(f"<h3>{html.escape(section.title)}</h3>")
+        if section.intro.startswith("- "):
+            items = "".join(f"<li>{_inline_html(line[2:])}</li>" for line in section.intro.splitlines() if line)
+            parts.append(f"<ul>{items}</ul>")
+        elif section.intro:
+            parts.append(f"<p>{_inline_html(section.intro)}</p>")
+        for label, level, text in section.items:
+            level_html = f" <code>{html.escape(level)}</code>" if level else ""
+            parts.append(f"<p><strong>{html.escape(label)}:</strong>{level_html} {_inline_html(text)}</p>")
+    return "\n".join(parts)
+
+_RENDERERS = {'txt': _report_txt, 'markdown': _report_markdown, 'html': _report_html}
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def report_body(key, fmt='txt'):
+    """Cached report for a profile key in one of FORMATS, without the name/subject header."""
+    if fmt not in _RENDERERS:
+        raise ValueError(f"Unsupported report format '{fmt}'. Choose one of: {', '.join(FORMATS)}.")
+    return _RENDERERS[fmt](key)
+
+def report_header(name, subject, fmt='txt'):
+    """The per-user part of a report."""
+    if fmt == 'markdown':
+        return f"**Name:** {name}  \n**Subject:** {subject}\n\n"
+    if fmt == 'html':
+        return f"<p><strong>Name:</strong> {html.escape(name)}<br><strong>Subject:</strong> {html.escape(subject)}</p>\n"
+    return f"Name: {name}\nSubject: {subject}\n\n"
+
+def render_report(key, name, subject, fmt='txt'):
+    """Full report: per-user header plus the cached body."""
+    body = report_body(key, fmt)
+    if fmt == 'html':
+        title = html.escape(f"{name} Profile Summary" if name else "Profile Summary")
+        return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head>\n"
+                f"<body>\n{report_header(name, subject, fmt)}{body}\n</body></html>\n")
+    return report_header(name, subject, fmt) + body
+
+def report_file_name(name, fmt='txt'):
+    extension = FORMATS[fmt][0]
+    return f"{name.replace(' ', '_')}_Profile_Summary.{extension}" if name else f"Profile_Summary.{extension}"
+
+def cache_stats():
+    """Hit/miss counters for each report cache, e.g. for a diagnostics panel."""
+    return {cache.__name__: cache.cache_info()._asdict() for cache in (report_sections, section_markdown, report_body)}
@@ -0,0 +1,142 @@
+import numpy as np
+
+# ------------------------------
+# VECTORIZED SCORING ENGINE
+# ------------------------------
+# Pure functions over arrays of factor levels: nothing here reads st.session_state, so the
+# same code scores the single profile on screen (N=1), a whole roster or historical rows.
+
+# --- Constants for variable names to avoid repetition (DRY Principle) ---
+SLIDER_VARS = [
+    'openness', 'conscientiousness', 'extraversion', 'agreeableness', 'neuroticism',
+    'selfEfficacy', 'selfAwareness', 'selfManagement', 'socialAwareness',
+    'relationshipSkills', 'decisionMaking'
+]
+CATEGORICAL_VARS = ['identity', 'moral', 'cognitive', 'priorAch']
+ALL_VARS = SLIDER_VARS + CATEGORICAL_VARS
+SEL_VARS = ['selfAwareness', 'selfManagement', 'socialAwareness', 'relationshipSkills', 'decisionMaking']
+COMPOSITES = ['motivation', 'exploration', 'stability', 'cognitiveFoundation']
+
+categorical_mappings = {
+    'identity': {'Identity Achievement': 100, 'Moratorium': 75, 'Foreclosure': 50, 'Identity Diffusion': 25},
+    'moral': {'Post-conventional': 100, 'Conventional': 75, 'Pre-conventional': 25},
+    'cognitive': {'High': 100, 'Average': 50, 'Low': 25},
+    'priorAch': {'High': 100, 'Average': 50, 'Low': 25}
+}
+
+level_mapping = {'Low': 25, 'Medium': 50, 'High': 75}
+
+PROFILES = ['High Readiness', 'Moderate Readiness', 'Low Readiness', 'Emerging Readiness']
+LEVEL_BANDS = ['high', 'medium', 'low']
+
+# Labels in widget order for every factor, and the points each label index maps to.
+FACTOR_LABELS = {var: list(level_mapping) for var in SLIDER_VARS}
+FACTOR_LABELS.update({var: list(categorical_mappings[var]) for var in CATEGORICAL_VARS})
+FACTOR_POINTS = {var: np.array(list(level_mapping.values()), dtype=np.int16) for var in SLIDER_VARS}
+FACTOR_POINTS.update({var: np.array(list(categorical_mappings[var].values()), dtype=np.int16) for var in CATEGORICAL_VARS})
+LABEL_INDEX = {var: {label: i for i, label in enumerate(labels)} for var, labels in FACTOR_LABELS.items()}
+
+# Below this many labels a dict lookup beats building a NumPy string array (e.g. the N=1 UI path).
+SMALL_BATCH = 64
+
+
+def map_level(level): return level_mapping.get(level, 0)
+
+def getLevel(v): return 'high' if v >= 75 else 'medium' if v >= 50 else 'low'
+
+# ------------------------------
+# ENCODING
+# ------------------------------
+def encode_labels(var, labels):
+    """Convert labels (e.g. 'Medium', 'Moratorium') to level indices for `var`.
+
+    Unknown labels raise a ValueError naming the factor. Integer-coded input skips this
+    step entirely and is the fast path for large batches.
+    """
+    if isinstance(labels, (list, tuple)) and len(labels) < SMALL_BATCH:
+        try:
+            return np.array([LABEL_INDEX[var][label] for label in labels], dtype=np.uint8)
+        except KeyError as e:
+            raise ValueError(f"Unknown level {str(e.args[0])!r} for factor '{var}'.") from None
+    labels = np.asarray(labels)
+    levels = np.full(labels.shape, 255, dtype=np.uint8)
+    # Each factor has at most four labels, so a few whole-array comparisons beat hashing.
+    for i, label in enumerate(FACTOR_LABELS[var]):
+        levels[labels == label] = i
+    unknown = levels == 255
+    if unknown.any():
+        raise ValueError(f"Unknown level {str(labels[unknown].flat[0])!r} for factor '{var}'.")
+    return levels
+
+def to_points(var, levels):
+    """Map level indices for `var` to their score points (25-100)."""
+    return FACTOR_POINTS[var][np.asarray(levels)]
+
+def encode_factors(factors):
+    """Level-index arrays for every factor from a mapping of var -> labels or indices."""
+    encoded = {}
+    for var in ALL_VARS:
+        values = factors[var]
+        if not (isinstance(values, (list, tuple)) and (not values or isinstance(values[0], str))):
+            values = np.asarray(values)
+        if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.integer):
+            out_of_range = (values < 0) | (values >= len(FACTOR_LABELS[var]))
+            if out_of_range.any():
+                raise ValueError(f"Unknown level {str(values[out_of_range].flat[0])!r} for factor '{var}'.")
+            encoded[var] = values
+        else:
+            encoded[var] = encode_labels(var, values)
+    return encoded
+
+# ------------------------------
+# SCORING
+# ------------------------------
+def _composite(*parts):
+    return np.rint(sum(p.astype(np.int32) for p in parts) / 3).astype(np.int16)
+
+def composite_scores(factors):
+    """The four composites and five SEL scores for N students at once.
+
+    `factors` maps every name in ALL_VARS to an array of labels or level indices.
+    Returns a dict of int16 arrays keyed like `score_one`.
+    """
+    encoded = encode_factors(factors)
+    p = {var: to_points(var, encoded[var]) for var in ALL_VARS}
+    scores = {
+        'motivation': _composite(p['conscientiousness'], p['selfEfficacy'], p['priorAch']),
+        'exploration': _composite(p['openness'], p['extraversion'], p['identity']),
+        'stability': _composite(p['agreeableness'], 100 - p['neuroticism'], p['moral']),  # Inverse neuroticism
+        'cognitiveFoundation': _composite(p['cognitive'], p['priorAch'], p['openness']),
+    }
+    # Direct mapping for SEL scores
+    for sel_var in SEL_VARS:
+        scores[sel_var] = p[sel_var]
+    return scores
+
+def readiness_profiles(scores):
+    """Index into PROFILES for each student, from the four composite arrays."""
+    total = sum(np.asarray(scores[c], dtype=np.int32) for c in COMPOSITES)
+    avg = np.rint(total / 4)
+    return (3 - (avg >= 25).astype(np.int8) - (avg >= 50) - (avg >= 75)).astype(np.uint8)
+
+def level_bands(values):
+    """Index into LEVEL_BANDS ('high', 'medium', 'low') for each score."""
+    values = np.asarray(values)
+    return (2 - (values >= 50).astype(np.int8) - (values >= 75)).astype(np.uint8)
+
+def score_batch(factors):
+    """Composites, SEL scores, readiness profile index and level bands for a batch."""
+    scores = composite_scores(factors)
+    result = dict(scores)
+    result['profile'] = readiness_profiles(scores)
+    result['bands'] = {key: level_bands(values) for key, values in scores.items()}
+    return result
+
+def score_one(factors):
+    """Score a single profile of labels; returns plain ints like the original UI code did."""
+    scores = composite_scores({var: [factors[var]] for var in ALL_VARS})
+    return {key: int(values[0]) for key, values in scores.items()}
+
+def profile_name(scores):
+    """Readiness profile name for a single dict of scores."""
+    return PROFILES[int(readiness_profiles({c: [scores[c]] for c in COMPOSITES})[0])]
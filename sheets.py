@@ -0,0 +1,79 @@
+import threading
+import time
+
+from instrumentation import acquire, timed
+
+# ------------------------------
+# GOOGLE SHEETS CONNECTION (LAZY, CACHED)
+# ------------------------------
+# Nothing here touches the network until a worksheet is actually needed (i.e. on submit).
+# The opened worksheet is reused until its TTL expires, and dropped as soon as an error
+# says the handle or the credentials behind it are no longer valid. gspread and oauth2client
+# are imported on first use, so a session that never submits never loads them.
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# Statuses meaning the cached handle (or client) is unusable and must be rebuilt.
+AUTH_STATUS = {401, 403}
+NOT_FOUND_STATUS = {404}
+
+
+def authorize(service_account_info):
+    """Build a gspread client from a service-account dict. No network I/O happens here."""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, SCOPE)
+    return gspread.authorize(creds)
+
+
+class WorksheetHandle:
+    """Thread-safe, lazily opened `sheet1` of one spreadsheet, cached with a TTL."""
+
+    def __init__(self, client_factory, sheet_id, ttl=900):
+        self._client_factory = client_factory
+        self.sheet_id = sheet_id
+        self.ttl = ttl
+        self._client = None
+        self._worksheet = None
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the worksheet, opening (or re-validating after the TTL) only when needed."""
+        with acquire(self._lock, 'worksheet_handle'):
+            if self._worksheet is not None and time.monotonic() - self._opened_at < self.ttl:
+                return self._worksheet
+            # Re-opening doubles as the health check: it fails on revoked access or a deleted sheet.
+            if self._client is None:
+                self._client = self._client_factory()
+            with timed('sheets_call_seconds', op='open_by_key'):
+                self._worksheet = self._client.open_by_key(self.sheet_id).sheet1
+            self._opened_at = time.monotonic()
+            return self._worksheet
+
+    def is_open(self):
+        with self._lock:
+            return self._worksheet is not None
+
+    def invalidate(self, drop_client=False):
+        """Forget the worksheet (and optionally the client) so the next `get` starts fresh."""
+        with self._lock:
+            self._worksheet = None
+            if drop_client:
+                self._client = None
+
+    def handle_error(self, error):
+        """Invalidate the cache if `error` means it is stale. Returns True when it did."""
+        import gspread
+        if isinstance(error, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+            self.invalidate()
+            return True
+        if isinstance(error, gspread.exceptions.APIError):
+            status = getattr(error.response, 'status_code', None)
+            if status in AUTH_STATUS:
+                self.invalidate(drop_client=True)
+                return True
+            if status in NOT_FOUND_STATUS:
+                self.invalidate()
+                return True
+        return False
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from instrumentation import acquire, inc, timed
+from scoring import ALL_VARS
+from submission_queue import SubmissionQueue, QUEUED, SENDING, RETRYING, WRITTEN, FAILED, is_ambiguous, is_retryable
+
+# ------------------------------
+# PLUGGABLE PERSISTENCE
+# ------------------------------
+# The submit path writes through a Storage backend:
+#   SheetsStorage  - straight to Google Sheets through the batched background writer
+#   SQLiteStorage  - a local SQLite (WAL) database; no network at all
+#   OutboxStorage  - commits to SQLite first (~1ms, crash-safe), then a replicator forwards
+#                    rows to Sheets. Every row carries an idempotency key, so retries,
+#                    double-clicks and a second replica never produce duplicate rows.
+
+REFLECTION_COLUMNS = ['key_insights_reflection', 'sel_focus_reflection',
+                      'teaching_strategies_reflection', 'foundational_domains_reflection']
+SHEET_COLUMNS = ['timestamp', 'user_name', 'subject', 'profile'] + ALL_VARS + REFLECTION_COLUMNS + \
+    ['profile_code', 'submission_key']
+KEY_COLUMN = SHEET_COLUMNS.index('submission_key') + 1  # 1-based, as gspread counts columns
+
+
+def submission_key(*parts):
+    """Deterministic idempotency key: the same session submitting the same content twice
+    (a double-click, a retried request) yields the same key."""
+    return hashlib.sha256(json.dumps([str(p) for p in parts]).encode()).hexdigest()[:32]
+
+
+class Storage:
+    """Interface for submission backends. `submit` must not block on the network."""
+
+    def submit(self, row):
+        """Persist a row whose last column is its submission key. Returns a ticket."""
+        raise NotImplementedError
+
+    def status(self, ticket):
+        """(state, error message) for a ticket, using the submission_queue states."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+# ------------------------------
+# GOOGLE SHEETS BACKEND
+# ------------------------------
+class SheetsStorage(Storage):
+    """Direct-to-Sheets backend on top of the batched SubmissionQueue."""
+
+    def __init__(self, handle, **queue_options):
+        self._queue = SubmissionQueue(handle.get, on_error=handle.handle_error, verify=self._in_sheet, **queue_options)
+
+    @staticmethod
+    def _in_sheet(worksheet, rows):
+        """Which rows the sheet already holds, by submission key (after an ambiguous failure)."""
+        with timed('sheets_call_seconds', op='col_values'):
+            existing = set(worksheet.col_values(KEY_COLUMN))
+        return [row[-1] in existing for row in rows]
+
+    def submit(self, row):
+        # The queue remembers keys as long as their tickets, so repeated keys are not queued twice.
+        return self._queue.submit(row, key=row[-1])
+
+    def status(self, ticket):
+        return self._queue.status(ticket)
+
+    def close(self):
+        self._queue.close()
+
+# ------------------------------
+# SQLITE (WAL) BACKEND
+# ------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_key TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    row TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    maybe_sent INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS submissions_by_state ON submissions (state, next_attempt_at);
+"""
+
+
+class SQLiteStorage(Storage):
+    """Submissions stored in a local SQLite database in WAL mode.
+
+    Standalone, rows are final as soon as they commit. With `initial_state=QUEUED` the
+    table doubles as an outbox that a replicator drains (see OutboxStorage).
+    """
+
+    def __init__(self, path, initial_state=WRITTEN, synchronous='NORMAL'):
+        self.path = path
+        self.initial_state = initial_state
+        # WAL lets readers and other processes proceed while one writer commits;
+        # synchronous=NORMAL keeps commits durable across application crashes.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def submit(self, row):
+        key = row[-1]
+        with acquire(self._lock, 'sqlite'), timed('sqlite_commit_seconds'):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO submissions (submission_key, created_at, row, state) VALUES (?, ?, ?, ?)",
+                (key, time.time(), json.dumps(row), self.initial_state))
+        return key
+
+    def status(self, ticket):
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT state, last_error FROM submissions WHERE submission_key = ?", (ticket,)).fetchone()
+        return found if found else (FAILED, 'Unknown submission.')
+
+    def rows(self, start=0, limit=-1):
+        """Stored rows in insertion order, skipping the first `start`."""
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT row FROM submissions ORDER BY id LIMIT ? OFFSET ?", (limit, start)).fetchall()
+        return [json.loads(row) for (row,) in found]
+
+    def counts(self):
+        """Number of submissions in each state."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM submissions GROUP BY state").fetchall())
+
+    # --- Outbox operations (used by the replicator) ---
+    def claim(self, limit, lease):
+        """Atomically lease up to `limit` due rows. Safe across threads and processes.
+
+        Returns (id, key, row, maybe_sent) tuples; `maybe_sent` marks rows that may already be
+        in the sheet: an earlier send failed ambiguously, or its lease expired mid-send.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                found = self._conn.execute(
+                    "SELECT id, submission_key, row, state, maybe_sent FROM submissions "
+                    "WHERE (state IN (?, ?) AND next_attempt_at <= ?) OR (state = ? AND lease_until < ?) "
+                    "ORDER BY id LIMIT ?",
+                    (QUEUED, RETRYING, now, SENDING, now, limit)).fetchall()
+                self._conn.executemany(
+                    "UPDATE submissions SET state = ?, lease_until = ? WHERE id = ?",
+                    [(SENDING, now + lease, row[0]) for row in found])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(row_id, key, json.loads(row), state == SENDING or bool(maybe_sent))
+                for row_id, key, row, state, maybe_sent in found]
+
+    def attempts(self, ids):
+        """Failed delivery attempts so far for each row id."""
+        if not ids:
+            return {}
+        with self._lock:
+            return dict(self._conn.execute(
+                f"SELECT id, attempts FROM submissions WHERE id IN ({','.join('?' * len(ids))})", list(ids)).fetchall())
+
+    def requeue(self, state=FAILED, key=None):
+        """Make rows in `state` (or just the row with submission `key`) due again with a fresh
+        retry budget. Returns how many."""
+        query, params = "UPDATE submissions SET state = ?, attempts = 0, next_attempt_at = 0 WHERE state = ?", [QUEUED, state]
+        if key is not None:
+            query, params = query + " AND submission_key = ?", params + [key]
+        with self._lock:
+            return self._conn.execute(query, params).rowcount
+
+    def mark(self, ids, state, error='', retry_at=0.0, maybe_sent=False):
+        # maybe_sent is sticky: a later unambiguous failure (say, a 503 while verifying keys)
+        # says nothing about whether an earlier dropped append landed.
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE submissions SET state = ?, last_error = ?, next_attempt_at = ?, lease_until = 0, "
+                "attempts = attempts + ?, maybe_sent = MAX(maybe_sent, ?) WHERE id = ?",
+                [(state, error, retry_at, int(state != WRITTEN), int(maybe_sent), row_id) for row_id in ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# ------------------------------
+# SQLITE OUTBOX + SHEETS REPLICATOR
+# ------------------------------
+class OutboxStorage(Storage):
+    """Commit locally, replicate to Sheets in the background with idempotency keys."""
+
+    def __init__(self, path, handle, batch_size=100, lease=120.0, poll_interval=1.0,
+                 max_retries=10, base_delay=1.0, max_delay=300.0):
+        self.outbox = SQLiteStorage(path, initial_state=QUEUED)
+        self._handle = handle
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Until we have looked, assume the sheet may already hold some of our rows
+        # (e.g. a previous process crashed between appending and marking them).
+        self._verify_keys = True
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='sheets-outbox-replicator', daemon=True)
+        self._worker.start()
+
+    def submit(self, row):
+        ticket = self.outbox.submit(row)
+        # Submitting a row that already gave up is the user asking to try again.
+        self.outbox.requeue(FAILED, key=ticket)
+        self._wake.set()
+        return ticket
+
+    def status(self, ticket):
+        return self.outbox.status(ticket)
+
+    def close(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        self._worker.join(timeout)
+        self.outbox.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                replicated = self.replicate_once()
+            except Exception:
+                # A broken sheet handle or database hiccup must never kill the replicator.
+                replicated = 0
+            if not replicated:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def replicate_once(self):
+        """Forward one batch of due rows. Returns how many rows were handled."""
+        batch = self.outbox.claim(self.batch_size, self.lease)
+        if not batch:
+            return 0
+        try:
+            worksheet = self._handle.get()
+            if self._verify_keys or any(maybe_sent for *_, maybe_sent in batch):
+                with timed('sheets_call_seconds', op='col_values'):
+                    existing = set(worksheet.col_values(KEY_COLUMN))
+                already = [row_id for row_id, key, _, _ in batch if key in existing]
+                self.outbox.mark(already, WRITTEN)
+                batch = [item for item in batch if item[1] not in existing]
+                self._verify_keys = False
+            if batch:
+                with timed('sheets_call_seconds', op='append_rows'):
+                    worksheet.append_rows([row for _, _, row, _ in batch])
+        except Exception as e:
+            self._handle.handle_error(e)
+            self._fail(batch, e)
+        else:
+            self.outbox.mark([row_id for row_id, *_ in batch], WRITTEN)
+        return len(batch) or 1
+
+    def _fail(self, batch, error):
+        inc('sheets_retries_total')
+        attempts = self.outbox.attempts([row_id for row_id, *_ in batch])
+        for row_id, *_ in batch:
+            tries = attempts.get(row_id, 0)
+            if not is_retryable(error) or tries >= self.max_retries:
+                # The row stays in the outbox, so nothing is lost; it can be re-queued later.
+                self.outbox.mark([row_id], FAILED, str(error), maybe_sent=is_ambiguous(error))
+                inc('submissions_failed_total')
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** tries) * random.uniform(0.5, 1.0)
+                self.outbox.mark([row_id], RETRYING, str(error), time.time() + delay, maybe_sent=is_ambiguous(error))
+
+    def requeue_failed(self):
+        """Give rows that exhausted their retries another chance. Returns how many."""
+        count = self.outbox.requeue(FAILED)
+        self._wake.set()
+        return count
+
+# ------------------------------
+# OPERATOR COMMANDS
+# ------------------------------
+def main(argv=None):
+    """Inspect an outbox database, or re-queue its failed rows, while the app keeps running.
+
+    python storage.py submissions.db           # rows per state
+    python storage.py submissions.db --requeue # failed rows get a fresh retry budget
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or re-queue the submission outbox.")
+    parser.add_argument('path', help="SQLite database named by [storage] path in the secrets")
+    parser.add_argument('--requeue', action='store_true', help="give failed rows another round of retries")
+    args = parser.parse_args(argv)
+
+    # The running replicator picks re-queued rows up on its next poll; WAL makes this safe.
+    outbox = SQLiteStorage(args.path, initial_state=QUEUED)
+    try:
+        if args.requeue:
+            print(f"Re-queued {outbox.requeue(FAILED)} failed row(s).")
+        for state, count in sorted(outbox.counts().items()):
+            print(f"{state:10} {count}")
+    finally:
+        outbox.close()
+    return 0
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
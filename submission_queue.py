@@ -0,0 +1,221 @@
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import inc, observe, timed
+
+# ------------------------------
+# BACKGROUND SUBMISSION QUEUE
+# ------------------------------
+# Submissions are acknowledged immediately and written to Google Sheets by a single
+# background worker. Pending rows are coalesced into one `append_rows` call, so a whole
+# class submitting at once costs a handful of API writes instead of one per student.
+
+QUEUED, SENDING, RETRYING, WRITTEN, FAILED = 'queued', 'sending', 'retrying', 'written', 'failed'
+PENDING_STATES = (QUEUED, SENDING, RETRYING)
+
+# HTTP statuses worth retrying: quota exhaustion and transient server-side failures.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """True for quota, server and network errors; False for bad requests or auth problems."""
+    import gspread
+    import requests
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error.response, 'status_code', None) in RETRYABLE_STATUS
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError))
+
+def is_ambiguous(error):
+    """True when a failed append may still have reached the sheet (timeouts, dropped connections)."""
+    import requests
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError))
+
+
+class SubmissionQueue:
+    """Thread-safe queue of sheet rows drained by a background batching writer.
+
+    `verify(sheet, rows)`, if given, returns one flag per row saying whether it is already in
+    the sheet. It is consulted before re-sending a batch whose last append failed ambiguously,
+    so a write that landed but lost its response is not appended a second time. A keyed row
+    that gave up in that state is checked the same way when its key is submitted again.
+    """
+
+    def __init__(self, sheet_factory, on_error=None, batch_size=100, linger=0.5, max_retries=6,
+                 base_delay=1.0, max_delay=60.0, max_tracked=10000, verify=None):
+        self._sheet_factory = sheet_factory
+        self._on_error = on_error
+        self._verify = verify
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_tracked = max_tracked
+
+        self._queue = queue.Queue()
+        self._status = OrderedDict()  # ticket -> (state, error message), least recently used first
+        self._keys = {}               # submission key -> ticket, forgotten along with the ticket
+        self._ticket_keys = {}        # ticket -> submission key
+        self._unverified = set()      # keys whose failed append may still have reached the sheet
+        self._status_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='sheets-submission-writer', daemon=True)
+        self._worker.start()
+
+    # --- Public API ---
+    def submit(self, row, key=None):
+        """Queue a row for writing and return its ticket. Never touches the network.
+
+        With a `key`, a row whose key is already queued or written returns the earlier ticket
+        instead of being queued again; a failed one is queued afresh.
+        """
+        with self._status_lock:
+            ticket = self._keys.get(key)
+            if ticket is not None and self._status[ticket][0] != FAILED:
+                self._status.move_to_end(ticket)
+                return ticket
+            ticket = f"sub-{next(self._ids)}"
+            if key is not None:
+                self._keys[key] = ticket
+                self._ticket_keys[ticket] = key
+            self._record(ticket, QUEUED)
+        self._queue.put((ticket, list(row), time.monotonic()))
+        return ticket
+
+    def status(self, ticket):
+        """Return (state, error message) for a ticket; unknown tickets report as failed."""
+        with self._status_lock:
+            if ticket not in self._status:
+                return FAILED, 'Unknown submission.'
+            self._status.move_to_end(ticket)
+            return self._status[ticket]
+
+    def pending(self):
+        """Number of rows not yet handed to the worker."""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """Block until every queued row has been written or has failed. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._status_lock:
+                busy = any(state in PENDING_STATES for state, _ in self._status.values())
+            if not busy:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def close(self, timeout=None):
+        """Write what is already queued, then stop the worker."""
+        self.flush(timeout)
+        self._stopped.set()
+        self._worker.join(timeout)
+
+    # --- Worker ---
+    def _set_status(self, ticket, state, error=''):
+        with self._status_lock:
+            self._record(ticket, state, error)
+
+    def _record(self, ticket, state, error=''):
+        """Update a ticket (caller holds the status lock) and evict the least recently used."""
+        self._status[ticket] = (state, error)
+        self._status.move_to_end(ticket)
+        # Forget the oldest finished tickets, and their keys, so memory stays bounded.
+        while len(self._status) > self.max_tracked:
+            oldest, (old_state, _) = next(iter(self._status.items()))
+            if old_state in PENDING_STATES:
+                break
+            del self._status[oldest]
+            key = self._ticket_keys.pop(oldest, None)
+            if key is not None and self._keys.get(key) == oldest:
+                del self._keys[key]
+                self._unverified.discard(key)
+
+    def _mark_unverified(self, tickets, maybe_sent):
+        """Remember (or forget) that these tickets' rows may be in the sheet, by key."""
+        with self._status_lock:
+            keys = {self._ticket_keys[ticket] for ticket in tickets if ticket in self._ticket_keys}
+            if maybe_sent:
+                self._unverified |= keys
+            else:
+                self._unverified -= keys
+
+    def _next_batch(self):
+        """Wait for one row, then linger briefly to coalesce whatever else arrives."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        pending = [(ticket, row) for ticket, row, _ in batch]
+        now = time.monotonic()
+        for _, _, queued_at in batch:
+            observe('submission_queue_seconds', now - queued_at)
+        with self._status_lock:
+            # A resubmitted key whose earlier attempt failed ambiguously is checked before sending.
+            maybe_sent = any(self._ticket_keys.get(ticket) in self._unverified for ticket, _ in pending)
+        for attempt in range(self.max_retries + 1):
+            tickets = [ticket for ticket, _ in pending]
+            for ticket in tickets:
+                self._set_status(ticket, SENDING)
+            try:
+                sheet = self._sheet_factory()
+                if maybe_sent and self._verify is not None:
+                    landed = self._verify(sheet, [row for _, row in pending])
+                    for (ticket, _), found in zip(pending, landed):
+                        if found:
+                            self._set_status(ticket, WRITTEN)
+                    self._mark_unverified(tickets, False)
+                    pending = [item for item, found in zip(pending, landed) if not found]
+                    tickets = [ticket for ticket, _ in pending]
+                    maybe_sent = False
+                    if not pending:
+                        return
+                with timed('sheets_call_seconds', op='append_rows'):
+                    sheet.append_rows([row for _, row in pending])
+            except Exception as e:
+                # Once an append may have landed, keep checking until a check succeeds: a later
+                # unambiguous failure says nothing about the earlier append.
+                maybe_sent = maybe_sent or is_ambiguous(e)
+                # Lets a cached worksheet handle drop itself if the error means it went stale.
+                if self._on_error is not None:
+                    self._on_error(e)
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self._mark_unverified(tickets, maybe_sent)
+                    for ticket in tickets:
+                        self._set_status(ticket, FAILED, str(e))
+                    inc('submissions_failed_total', len(tickets))
+                    return
+                for ticket in tickets:
+                    self._set_status(ticket, RETRYING, str(e))
+                inc('sheets_retries_total')
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                self._mark_unverified(tickets, False)
+                for ticket in tickets:
+                    self._set_status(ticket, WRITTEN)
+                return
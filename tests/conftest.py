@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+
+import gspread
+import pytest
+import requests
+
+# The app is a set of top-level modules run from the repository root, not an installed package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DROP = 'drop'  # the call takes effect, then the connection dies before the response arrives
+
+
+def api_error(status, message=None):
+    response = requests.Response()
+    response.status_code = status
+    message = message or f"HTTP {status}"
+    response._content = json.dumps({'error': {'code': status, 'message': message, 'status': 'ERROR'}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+class ScriptedWorksheet:
+    """In-memory worksheet whose calls fail as scripted: `script[method]` is consumed one entry
+    per call, each None (succeed), DROP or an exception to raise before doing anything."""
+
+    def __init__(self):
+        self.rows = []
+        self.script = {'append_rows': [], 'col_values': []}
+        self.calls = {'append_rows': 0, 'col_values': 0}
+
+    def _outcome(self, method):
+        self.calls[method] += 1
+        outcome = self.script[method].pop(0) if self.script[method] else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def append_rows(self, rows, **kwargs):
+        outcome = self._outcome('append_rows')
+        self.rows.extend(list(row) for row in rows)
+        if outcome == DROP:
+            raise requests.exceptions.ConnectionError("Connection aborted.")
+
+    def col_values(self, col):
+        self._outcome('col_values')
+        return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+
+class Handle:
+    """WorksheetHandle stand-in that always hands out the same worksheet."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def get(self):
+        return self.worksheet
+
+    def handle_error(self, error):
+        return False
+
+
+@pytest.fixture
+def sheet():
+    return ScriptedWorksheet()
+
+@pytest.fixture
+def handle(sheet):
+    return Handle(sheet)
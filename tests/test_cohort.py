@@ -0,0 +1,176 @@
+import os
+import random
+
+import gspread
+import pytest
+
+from cohort import CODE_COLUMN, FACTORS_START, CohortCache, SheetsRowSource
+from conftest import Handle, ScriptedWorksheet, api_error
+from profile_codec import encode_profile
+from scoring import ALL_VARS, COMPOSITES, FACTOR_LABELS, PROFILES, profile_name, score_one
+from storage import SHEET_COLUMNS
+
+HEADER = list(SHEET_COLUMNS)
+GRID_LIMITS = "Range ('Sheet1'!A{row}:Y) exceeds grid limits. Max rows: {rows}, max columns: 25"
+
+
+class GridWorksheet(ScriptedWorksheet):
+    """ScriptedWorksheet that also serves `get_values` reads of 'A<n>:<column>' ranges."""
+
+    def __init__(self):
+        super().__init__()
+        self.script['get_values'] = []
+        self.calls['get_values'] = 0
+
+    def get_values(self, range_name):
+        self._outcome('get_values')
+        start = int(range_name.split(':')[0][1:])
+        return [list(row) for row in self.rows[start - 1:]]
+
+@pytest.fixture
+def grid():
+    worksheet = GridWorksheet()
+    worksheet.rows.append(HEADER)
+    return worksheet
+
+@pytest.fixture
+def cohort(grid):
+    return CohortCache(SheetsRowSource(Handle(grid)), min_interval=0)
+
+
+def random_factors(rng):
+    return {var: rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS}
+
+def stored_row(factors, with_code=True):
+    row = ['2026-01-01 09:00:00', 'Ada', 'Maths', ''] + [''] * (len(SHEET_COLUMNS) - 4)
+    row[FACTORS_START:FACTORS_START + len(ALL_VARS)] = [factors[var] for var in ALL_VARS]
+    row[CODE_COLUMN] = str(encode_profile(factors)) if with_code else ''
+    return row
+
+def add_rows(grid, count, rng):
+    """Append `count` rows, some without a profile code (as written before the column existed)."""
+    factors = [random_factors(rng) for _ in range(count)]
+    grid.rows.extend(stored_row(f, with_code=rng.random() < 0.8) for f in factors)
+    return factors
+
+def expected_summary(all_factors):
+    """The summary recomputed from scratch, one profile at a time."""
+    scores = [score_one(f) for f in all_factors]
+    total = len(all_factors)
+    return {
+        'total': total,
+        'profiles': {name: sum(profile_name(s) == name for s in scores) for name in PROFILES},
+        'composite_means': {name: sum(s[name] for s in scores) / total for name in COMPOSITES},
+        'levels': {var: {label: sum(f[var] == label for f in all_factors) for label in FACTOR_LABELS[var]}
+                   for var in ALL_VARS},
+    }
+
+# ------------------------------
+# INCREMENTAL SYNC
+# ------------------------------
+def test_sync_reads_only_new_rows_and_keeps_running_aggregates(cohort, grid):
+    rng = random.Random(7)
+    first = add_rows(grid, 40, rng)
+    assert cohort.sync() == 41  # the header is consumed but not counted as a profile
+    assert cohort.summary() == expected_summary(first)
+
+    second = add_rows(grid, 25, rng)
+    assert cohort.sync() == 25
+    assert cohort.rows_seen == 66
+    assert cohort.summary() == expected_summary(first + second)
+    assert cohort.codes.tolist() == [encode_profile(f) for f in first + second]
+    assert cohort.rows.tolist() == list(range(1, 66))
+    assert cohort.sync() == 0
+    assert grid.calls['get_values'] == 3
+
+def test_sync_skips_rows_it_cannot_read(cohort, grid):
+    rng = random.Random(3)
+    factors = add_rows(grid, 2, rng)
+    grid.rows.insert(2, stored_row(dict(factors[0], moral='Sometimes'), with_code=False))
+    assert cohort.sync() == 4
+    assert cohort.size == 2
+    assert cohort.rows.tolist() == [1, 3]
+
+def test_sync_waits_out_the_minimum_interval(grid):
+    cohort = CohortCache(SheetsRowSource(Handle(grid)), min_interval=3600)
+    add_rows(grid, 5, random.Random(1))
+    assert cohort.sync() == 6
+    add_rows(grid, 5, random.Random(2))
+    assert cohort.sync() == 0
+    assert cohort.sync(force=True) == 5
+
+def test_growing_the_code_column_keeps_earlier_codes(cohort, grid):
+    factors = add_rows(grid, 1500, random.Random(5))
+    cohort.sync()
+    factors += add_rows(grid, 700, random.Random(6))
+    cohort.sync()
+    assert cohort.codes.tolist() == [encode_profile(f) for f in factors]
+    with pytest.raises(ValueError):
+        cohort.codes[0] = 0
+
+# ------------------------------
+# READS PAST THE GRID
+# ------------------------------
+def test_a_read_past_the_grid_means_no_new_rows(cohort, grid):
+    factors = add_rows(grid, 3, random.Random(4))
+    cohort.sync()
+    grid.script['get_values'] = [api_error(400, GRID_LIMITS.format(row=5, rows=4))]
+    assert cohort.sync() == 0
+    assert cohort.rows_seen == 4
+    factors += add_rows(grid, 2, random.Random(8))
+    assert cohort.sync() == 2
+    assert cohort.summary() == expected_summary(factors)
+
+def test_other_bad_requests_are_raised(cohort, grid):
+    grid.script['get_values'] = [api_error(400, "Unable to parse range: Sheet1!A1:Y")]
+    with pytest.raises(gspread.exceptions.APIError):
+        cohort.sync()
+    assert cohort.rows_seen == 0
+
+# ------------------------------
+# PARQUET SNAPSHOT
+# ------------------------------
+@pytest.fixture
+def snapshot(tmp_path, grid):
+    """A snapshot directory written by three syncs, and the cache that wrote it."""
+    pytest.importorskip('pyarrow')
+    rng = random.Random(11)
+    cohort = CohortCache(SheetsRowSource(Handle(grid)), snapshot_dir=str(tmp_path), min_interval=0)
+    for count in (30, 20, 10):
+        add_rows(grid, count, rng)
+        cohort.sync()
+    return str(tmp_path), cohort
+
+def test_snapshot_reload_restores_the_cache_without_reading_the_sheet(snapshot, grid):
+    snapshot_dir, written = snapshot
+    assert len(os.listdir(snapshot_dir)) == 3
+    reads = grid.calls['get_values']
+    reloaded = CohortCache(SheetsRowSource(Handle(grid)), snapshot_dir=snapshot_dir, min_interval=0)
+    assert grid.calls['get_values'] == reads
+    assert reloaded.rows_seen == written.rows_seen == 61
+    assert reloaded.codes.tolist() == written.codes.tolist()
+    assert reloaded.rows.tolist() == written.rows.tolist()
+    assert reloaded.summary() == written.summary()
+    assert reloaded.sync() == 0
+
+def test_snapshot_reload_stops_at_a_gap_and_refetches_from_there(snapshot, grid):
+    snapshot_dir, written = snapshot
+    parts = sorted(os.listdir(snapshot_dir))
+    os.remove(os.path.join(snapshot_dir, parts[1]))
+    reloaded = CohortCache(SheetsRowSource(Handle(grid)), snapshot_dir=snapshot_dir, min_interval=0)
+    assert reloaded.rows_seen == 31  # the first part only; the one after the gap is ignored
+    assert reloaded.sync() == 30
+    assert reloaded.codes.tolist() == written.codes.tolist()
+    assert reloaded.rows.tolist() == written.rows.tolist()
+    assert reloaded.summary() == written.summary()
+
+def test_parts_without_row_indices_still_load(snapshot):
+    import pandas as pd
+    snapshot_dir, written = snapshot
+    for name in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, name)
+        pd.read_parquet(path).drop(columns='row').to_parquet(path, index=False)
+    reloaded = CohortCache(None, snapshot_dir=snapshot_dir)
+    assert reloaded.codes.tolist() == written.codes.tolist()
+    assert (reloaded.rows == -1).all()
+    assert reloaded.summary() == written.summary()
@@ -0,0 +1,104 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from profile_codec import (
+    CODE_VARS, PROFILE_SPACE, READINESS_SIZE, READINESS_VARS, decode_profile, encode_profile, from_token,
+    pack, profile_for_code, readiness_lookup, to_token, unpack
+)
+from scoring import ALL_VARS, FACTOR_LABELS, PROFILES, SEL_VARS, profile_name, score_one
+
+# The scoring exactly as the original page wrote it, kept literal so the engine, the codec and
+# the lookup table are all checked against something none of them share code with.
+LEVELS = {'Low': 25, 'Medium': 50, 'High': 75}
+CATEGORICAL = {
+    'identity': {'Identity Achievement': 100, 'Moratorium': 75, 'Foreclosure': 50, 'Identity Diffusion': 25},
+    'moral': {'Post-conventional': 100, 'Conventional': 75, 'Pre-conventional': 25},
+    'cognitive': {'High': 100, 'Average': 50, 'Low': 25},
+    'priorAch': {'High': 100, 'Average': 50, 'Low': 25},
+}
+
+
+def original_scores(f):
+    scores = {
+        'motivation': round((LEVELS[f['conscientiousness']] + LEVELS[f['selfEfficacy']] + CATEGORICAL['priorAch'][f['priorAch']]) / 3),
+        'exploration': round((LEVELS[f['openness']] + LEVELS[f['extraversion']] + CATEGORICAL['identity'][f['identity']]) / 3),
+        'stability': round((LEVELS[f['agreeableness']] + (100 - LEVELS[f['neuroticism']]) + CATEGORICAL['moral'][f['moral']]) / 3),
+        'cognitiveFoundation': round((CATEGORICAL['cognitive'][f['cognitive']] + CATEGORICAL['priorAch'][f['priorAch']] + LEVELS[f['openness']]) / 3),
+    }
+    for var in SEL_VARS:
+        scores[var] = LEVELS[f[var]]
+    return scores
+
+def original_profile(scores):
+    avg = round((scores['motivation'] + scores['exploration'] + scores['stability'] + scores['cognitiveFoundation']) / 4)
+    if avg >= 75: return 'High Readiness'
+    if avg >= 50: return 'Moderate Readiness'
+    if avg >= 25: return 'Low Readiness'
+    return 'Emerging Readiness'
+
+def random_profiles(count, seed=0):
+    rng = random.Random(seed)
+    return [{var: rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS} for _ in range(count)]
+
+
+def test_profile_space_fits_25_bits():
+    assert PROFILE_SPACE == int(np.prod([len(FACTOR_LABELS[var]) for var in ALL_VARS]))
+    assert PROFILE_SPACE <= 2 ** 25
+    assert sorted(CODE_VARS) == sorted(ALL_VARS)
+
+@pytest.mark.parametrize('profile', random_profiles(500))
+def test_encode_decode_round_trip(profile):
+    code = encode_profile(profile)
+    assert 0 <= code < PROFILE_SPACE
+    assert decode_profile(code) == profile
+    assert from_token(to_token(code)) == code
+
+def test_pack_matches_encode_profile():
+    profiles = random_profiles(2000, seed=1)
+    levels = {var: [FACTOR_LABELS[var].index(p[var]) for p in profiles] for var in ALL_VARS}
+    codes = pack(levels)
+    assert codes.tolist() == [encode_profile(p) for p in profiles]
+    unpacked = unpack(codes)
+    assert all(unpacked[var].tolist() == levels[var] for var in ALL_VARS)
+
+def test_extreme_codes_round_trip():
+    for code in (0, PROFILE_SPACE - 1):
+        assert encode_profile(decode_profile(code)) == code
+        assert from_token(to_token(code)) == code
+
+@pytest.mark.parametrize('code', [-1, PROFILE_SPACE])
+def test_out_of_range_codes_are_rejected(code):
+    with pytest.raises(ValueError):
+        decode_profile(code)
+    with pytest.raises(ValueError):
+        unpack([max(code, PROFILE_SPACE)])
+
+@pytest.mark.parametrize('token', ['', 'not a token', '!!!!!!', to_token(PROFILE_SPACE - 1) + 'A', 'AAAAAAAA'])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(ValueError):
+        from_token(token)
+
+def test_tokens_past_the_profile_space_are_rejected():
+    with pytest.raises(ValueError):
+        from_token(to_token(PROFILE_SPACE))
+
+def test_lookup_table_matches_original_formulas_for_every_readiness_combination():
+    # SEL factors never affect readiness, so varying them at random covers the whole space.
+    rng = random.Random(2)
+    combinations = list(itertools.product(*(FACTOR_LABELS[var] for var in READINESS_VARS)))
+    assert len(combinations) == READINESS_SIZE
+    profiles = [dict(zip(READINESS_VARS, combo), **{var: rng.choice(FACTOR_LABELS[var]) for var in SEL_VARS})
+                for combo in combinations]
+    codes = np.array([encode_profile(p) for p in profiles], dtype=np.uint32)
+    expected = [original_profile(original_scores(p)) for p in profiles]
+    assert [PROFILES[i] for i in readiness_lookup(codes)] == expected
+
+@pytest.mark.parametrize('profile', random_profiles(300, seed=3))
+def test_single_profile_paths_match_original_formulas(profile):
+    scores = original_scores(profile)
+    assert score_one(profile) == scores
+    assert profile_name(scores) == original_profile(scores)
+    assert profile_for_code(encode_profile(profile)) == original_profile(scores)
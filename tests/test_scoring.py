@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from scoring import ALL_VARS, FACTOR_LABELS, composite_scores, score_batch
+
+
+def level_indices(count=3, **overrides):
+    levels = {var: np.zeros(count, dtype=np.int64) for var in ALL_VARS}
+    levels.update({var: np.asarray(values) for var, values in overrides.items()})
+    return levels
+
+def test_integer_levels_score_like_labels():
+    labels = {var: [FACTOR_LABELS[var][-1]] * 2 for var in ALL_VARS}
+    indices = {var: np.full(2, len(FACTOR_LABELS[var]) - 1, dtype=np.uint8) for var in ALL_VARS}
+    by_label, by_index = score_batch(labels), score_batch(indices)
+    assert by_label['profile'].tolist() == by_index['profile'].tolist()
+    assert all(by_label[key].tolist() == by_index[key].tolist() for key in composite_scores(labels))
+
+@pytest.mark.parametrize('bad', [-1, 3, 255])
+def test_out_of_range_level_indices_are_rejected(bad):
+    with pytest.raises(ValueError, match="Unknown level .* for factor 'openness'"):
+        composite_scores(level_indices(openness=[0, bad, 1]))
+
+def test_unknown_labels_are_rejected():
+    factors = {var: [FACTOR_LABELS[var][0]] for var in ALL_VARS}
+    factors['moral'] = ['Sometimes']
+    with pytest.raises(ValueError, match="Unknown level 'Sometimes' for factor 'moral'"):
+        composite_scores(factors)
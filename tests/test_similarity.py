@@ -0,0 +1,121 @@
+import math
+import random
+
+import pytest
+
+from cohort import CODE_COLUMN, CohortCache, SQLiteRowSource
+from profile_codec import encode_profile
+from scoring import ALL_VARS, COMPOSITES, FACTOR_LABELS, SEL_VARS, to_points
+from similarity import DIMENSIONS, SimilarityIndex, weight_vector
+from storage import SHEET_COLUMNS, SQLiteStorage
+
+# Composite definitions spelled out as in the report: the mean of three factors' points.
+COMPOSITE_TERMS = {
+    'motivation': lambda p: p['conscientiousness'] + p['selfEfficacy'] + p['priorAch'],
+    'exploration': lambda p: p['openness'] + p['extraversion'] + p['identity'],
+    'stability': lambda p: p['agreeableness'] + (100 - p['neuroticism']) + p['moral'],
+    'cognitiveFoundation': lambda p: p['cognitive'] + p['priorAch'] + p['openness'],
+}
+
+
+def tripled_scores(factors):
+    """Each report score times three, as exact integers."""
+    points = {var: int(to_points(var, FACTOR_LABELS[var].index(factors[var]))) for var in ALL_VARS}
+    scores = {name: COMPOSITE_TERMS[name](points) for name in COMPOSITES}
+    scores.update({var: 3 * points[var] for var in SEL_VARS})
+    return scores
+
+def brute_force(stored, target, k, weights=None):
+    """[(row, code, distance)] by scanning every stored profile, ties broken newest first."""
+    weights = weights or {}
+    w = {name: weights.get(name, 1.0) for name in DIMENSIONS}
+    goal = tripled_scores(target)
+    ranked = []
+    for row, factors in stored:
+        scores = tripled_scores(factors)
+        squared = sum(w[name] * (scores[name] - goal[name]) ** 2 for name in DIMENSIONS)
+        ranked.append((squared, -row, encode_profile(factors)))
+    ranked.sort()
+    norm = sum(w.values()) * 9
+    return [(-negative_row, code, math.sqrt(squared / norm)) for squared, negative_row, code in ranked[:k]]
+
+def stored_row(factors, key):
+    row = ['2026-01-01 09:00:00', 'Ada', 'Maths', ''] + [factors[var] for var in ALL_VARS]
+    row += [''] * (len(SHEET_COLUMNS) - len(row))
+    row[CODE_COLUMN], row[-1] = str(encode_profile(factors)), key
+    return row
+
+def assert_same(found, expected):
+    assert [(row, code) for row, code, _ in found] == [(row, code) for row, code, _ in expected]
+    assert [distance for *_, distance in found] == pytest.approx([distance for *_, distance in expected], abs=1e-4)
+
+# 400 submissions drawn from 25 distinct profiles, so most distances tie.
+_rng = random.Random(13)
+POOL = [{var: _rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS} for _ in range(25)]
+STORED = [(i, _rng.choice(POOL)) for i in range(400)]  # (source row, factors)
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'submissions.db'))
+    for i, factors in STORED:
+        storage.submit(stored_row(factors, f"k{i}"))
+    return storage
+
+@pytest.fixture
+def cohort(storage):
+    cohort = CohortCache(SQLiteRowSource(storage), min_interval=0)
+    cohort.sync()
+    return cohort
+
+@pytest.fixture
+def index(cohort):
+    index = SimilarityIndex(cohort)
+    assert index.refresh() == 400
+    return index
+
+# ------------------------------
+# QUERIES AGAINST A BRUTE-FORCE SCAN
+# ------------------------------
+@pytest.mark.parametrize('k', [1, 5, 40, 400, 1000])
+def test_query_matches_a_brute_force_scan(index, k):
+    rng = random.Random(k)
+    for target in POOL[:5] + [{var: rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS}]:
+        assert_same(index.query(encode_profile(target), k=k), brute_force(STORED, target, k))
+
+@pytest.mark.parametrize('weights', [
+    {'motivation': 4},
+    {'stability': 0, 'decisionMaking': 0.5, 'selfAwareness': 3},
+    {name: (1.0 if name == 'exploration' else 0) for name in DIMENSIONS},
+])
+def test_weighted_query_matches_a_brute_force_scan(index, weights):
+    # Targets outside the pool, so the nearest profiles are not all exact copies at distance 0.
+    rng = random.Random(17)
+    for target in [{var: rng.choice(FACTOR_LABELS[var]) for var in ALL_VARS} for _ in range(5)]:
+        assert_same(index.query(encode_profile(target), k=40, weights=weights),
+                    brute_force(STORED, target, 40, weights))
+
+def test_identical_profiles_come_back_newest_first(index):
+    target = STORED[0][1]
+    same = [row for row, factors in STORED if factors == target]
+    found = index.query(encode_profile(target), k=len(same))
+    assert [row for row, _, _ in found] == sorted(same, reverse=True)
+    assert all(distance == 0 for *_, distance in found)
+
+def test_refresh_indexes_only_new_profiles(storage, cohort, index):
+    target = {var: FACTOR_LABELS[var][0] for var in ALL_VARS}
+    storage.submit(stored_row(target, 'late'))
+    cohort.sync()
+    assert len(index.query(encode_profile(target), k=1000)) == 400
+    assert index.refresh() == 1
+    assert index.refresh() == 0
+    assert index.query(encode_profile(target), k=1)[0] == (400, encode_profile(target), 0.0)
+    assert_same(index.query(encode_profile(target), k=20), brute_force(STORED + [(400, target)], target, 20))
+
+def test_empty_index_and_zero_k_return_nothing(cohort, index):
+    assert SimilarityIndex(cohort).query(cohort.codes[0]) == []
+    assert index.query(cohort.codes[0], k=0) == []
+
+@pytest.mark.parametrize('weights', [{'grit': 1}, {'motivation': -1}, {name: 0 for name in DIMENSIONS}])
+def test_bad_weights_are_rejected(weights):
+    with pytest.raises(ValueError):
+        weight_vector(weights)
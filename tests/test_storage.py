@@ -0,0 +1,124 @@
+import pytest
+
+from conftest import DROP, api_error
+from storage import FAILED, QUEUED, RETRYING, SENDING, SHEET_COLUMNS, WRITTEN, OutboxStorage, SQLiteStorage
+
+
+def row(key):
+    """A sheet row whose last column is the submission key, as the page builds them."""
+    return ['2026-01-01 09:00:00', 'Ada', 'Maths'] + [''] * (len(SHEET_COLUMNS) - 4) + [key]
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / 'submissions.db')
+
+@pytest.fixture
+def outbox(db, handle):
+    """An OutboxStorage whose background replicator is stopped, so tests drive it step by step."""
+    storage = OutboxStorage(db, handle, base_delay=0, max_retries=2)
+    storage._stopped.set()
+    storage._wake.set()
+    storage._worker.join()
+    yield storage
+    storage.outbox.close()
+
+# ------------------------------
+# SQLITE STORAGE AND OUTBOX TABLE
+# ------------------------------
+def test_submitting_a_key_twice_stores_one_row(db):
+    storage = SQLiteStorage(db)
+    assert storage.submit(row('k1')) == storage.submit(row('k1')) == 'k1'
+    assert storage.rows() == [row('k1')]
+    assert storage.status('k1') == (WRITTEN, '')
+
+def test_claim_leases_each_row_once(db):
+    storage = SQLiteStorage(db, initial_state=QUEUED)
+    for key in ('k1', 'k2', 'k3'):
+        storage.submit(row(key))
+    first = storage.claim(2, lease=60)
+    second = storage.claim(10, lease=60)
+    assert [key for _, key, _, _ in first] == ['k1', 'k2']
+    assert [key for _, key, _, _ in second] == ['k3']
+    assert storage.claim(10, lease=60) == []
+    assert not any(maybe_sent for *_, maybe_sent in first + second)
+    assert storage.counts() == {SENDING: 3}
+
+def test_expired_lease_is_reclaimed_as_maybe_sent(db):
+    storage = SQLiteStorage(db, initial_state=QUEUED)
+    storage.submit(row('k1'))
+    storage.claim(1, lease=-1)  # the claimer died mid-send
+    [(_, key, _, maybe_sent)] = storage.claim(1, lease=60)
+    assert key == 'k1' and maybe_sent
+
+def test_maybe_sent_survives_a_later_unambiguous_failure(db):
+    storage = SQLiteStorage(db, initial_state=QUEUED)
+    storage.submit(row('k1'))
+    [(row_id, *_)] = storage.claim(1, lease=60)
+    storage.mark([row_id], RETRYING, 'dropped', maybe_sent=True)
+    storage.claim(1, lease=60)
+    storage.mark([row_id], RETRYING, 'HTTP 503', maybe_sent=False)
+    [(_, _, _, maybe_sent)] = storage.claim(1, lease=60)
+    assert maybe_sent
+    assert storage.attempts([row_id]) == {row_id: 2}
+
+# ------------------------------
+# OUTBOX REPLICATION
+# ------------------------------
+def test_rows_already_in_the_sheet_at_startup_are_not_appended_again(outbox, sheet):
+    # A previous process appended the row but crashed before marking it written.
+    sheet.rows.append(row('k1'))
+    outbox.submit(row('k1'))
+    outbox.replicate_once()
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls['append_rows'] == 0
+    assert outbox.status('k1') == (WRITTEN, '')
+
+def test_dropped_append_is_verified_not_repeated(outbox, sheet):
+    sheet.script['append_rows'] = [DROP]
+    outbox.submit(row('k1'))
+    outbox.replicate_once()
+    assert outbox.status('k1')[0] == RETRYING
+    outbox.replicate_once()
+    assert sheet.rows == [row('k1')]
+    assert outbox.status('k1') == (WRITTEN, '')
+
+def test_dropped_append_followed_by_failed_verification_is_not_repeated(outbox, sheet):
+    # Startup check, then the check after the drop fails with a plain 503.
+    sheet.script['col_values'] = [None, api_error(503)]
+    sheet.script['append_rows'] = [DROP]
+    outbox.submit(row('k1'))
+    for _ in range(3):
+        outbox.replicate_once()
+    assert sheet.rows == [row('k1')]
+    assert outbox.status('k1') == (WRITTEN, '')
+
+def test_unambiguous_failures_are_retried_without_verification(outbox, sheet):
+    sheet.script['append_rows'] = [api_error(503)]
+    outbox.submit(row('k1'))
+    outbox.replicate_once()
+    outbox.replicate_once()
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls['col_values'] == 1  # the startup check only
+
+def test_exhausted_rows_fail_and_resubmitting_requeues_them(outbox, sheet):
+    sheet.script['append_rows'] = [api_error(503)] * 3
+    outbox.submit(row('k1'))
+    for _ in range(3):
+        outbox.replicate_once()
+    assert outbox.status('k1')[0] == FAILED
+    assert outbox.outbox.rows() == [row('k1')]  # still stored locally
+
+    assert outbox.submit(row('k1')) == 'k1'
+    assert outbox.status('k1')[0] == QUEUED
+    outbox.replicate_once()
+    assert sheet.rows == [row('k1')]
+    assert outbox.status('k1') == (WRITTEN, '')
+
+def test_requeue_failed_gives_every_failed_row_a_fresh_budget(outbox, sheet):
+    sheet.script['append_rows'] = [ValueError("bad credentials")]
+    outbox.submit(row('k1'))
+    outbox.replicate_once()
+    assert outbox.status('k1')[0] == FAILED
+    assert outbox.requeue_failed() == 1
+    outbox.replicate_once()
+    assert outbox.status('k1') == (WRITTEN, '')
@@ -0,0 +1,98 @@
+import pytest
+
+from conftest import DROP, api_error
+from storage import SHEET_COLUMNS, SheetsStorage
+from submission_queue import FAILED, WRITTEN, SubmissionQueue
+
+
+def row(key):
+    return ['2026-01-01 09:00:00', 'Ada', 'Maths'] + [''] * (len(SHEET_COLUMNS) - 4) + [key]
+
+@pytest.fixture
+def storage(handle):
+    storage = SheetsStorage(handle, linger=0, base_delay=0.001, max_retries=3)
+    yield storage
+    storage.close()
+
+def settle(storage, *tickets):
+    assert storage._queue.flush(timeout=5)
+    return [storage.status(ticket) for ticket in tickets]
+
+
+def test_rows_are_written_once(storage, sheet):
+    ticket = storage.submit(row('k1'))
+    assert settle(storage, ticket) == [(WRITTEN, '')]
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls['col_values'] == 0
+
+def test_dropped_append_is_verified_not_repeated(storage, sheet):
+    sheet.script['append_rows'] = [DROP]
+    ticket = storage.submit(row('k1'))
+    assert settle(storage, ticket) == [(WRITTEN, '')]
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls == {'append_rows': 1, 'col_values': 1}
+
+def test_failed_verification_keeps_checking_before_resending(storage, sheet):
+    sheet.script['append_rows'] = [DROP]
+    sheet.script['col_values'] = [api_error(503)]
+    ticket = storage.submit(row('k1'))
+    assert settle(storage, ticket) == [(WRITTEN, '')]
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls == {'append_rows': 1, 'col_values': 2}
+
+def test_only_rows_missing_from_the_sheet_are_resent(handle, sheet):
+    # Both rows go out in one batch; another writer had already stored k2.
+    sheet.rows.append(row('k2'))
+    sheet.script['append_rows'] = [ConnectionError("Connection reset by peer")]
+    storage = SheetsStorage(handle, linger=0.2, base_delay=0.001)
+    tickets = [storage.submit(row(key)) for key in ('k1', 'k2')]
+    assert settle(storage, *tickets) == [(WRITTEN, ''), (WRITTEN, '')]
+    storage.close()
+    assert [r[-1] for r in sheet.rows] == ['k2', 'k1']
+    assert sheet.calls == {'append_rows': 2, 'col_values': 1}
+
+def test_unambiguous_failures_are_retried_without_verification(storage, sheet):
+    sheet.script['append_rows'] = [api_error(503), api_error(429)]
+    ticket = storage.submit(row('k1'))
+    assert settle(storage, ticket) == [(WRITTEN, '')]
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls == {'append_rows': 3, 'col_values': 0}
+
+def test_non_retryable_errors_fail_at_once(storage, sheet):
+    sheet.script['append_rows'] = [api_error(400)]
+    ticket = storage.submit(row('k1'))
+    [(state, _)] = settle(storage, ticket)
+    assert state == FAILED
+    assert sheet.calls['append_rows'] == 1
+
+def test_repeated_key_returns_the_same_ticket_until_it_fails(storage, sheet):
+    sheet.script['append_rows'] = [api_error(400)]
+    first = storage.submit(row('k1'))
+    assert storage.submit(row('k1')) == first
+    settle(storage, first)
+    retry = storage.submit(row('k1'))
+    assert retry != first
+    assert settle(storage, retry) == [(WRITTEN, '')]
+    assert storage.submit(row('k1')) == retry
+    assert sheet.rows == [row('k1')]
+
+def test_resubmitting_after_an_ambiguous_failure_checks_the_sheet_first(storage, sheet):
+    # The append lands but its response is lost, then the check fails for good (revoked access).
+    sheet.script['append_rows'] = [DROP]
+    sheet.script['col_values'] = [api_error(403)]
+    first = storage.submit(row('k1'))
+    [(state, _)] = settle(storage, first)
+    assert state == FAILED
+    retry = storage.submit(row('k1'))
+    assert settle(storage, retry) == [(WRITTEN, '')]
+    assert sheet.rows == [row('k1')]
+    assert sheet.calls == {'append_rows': 1, 'col_values': 2}
+
+def test_keys_are_forgotten_with_their_tickets(handle):
+    queue = SubmissionQueue(handle.get, linger=0, max_tracked=3)
+    tickets = [queue.submit(row(f'k{i}'), key=f'k{i}') for i in range(6)]
+    assert queue.flush(timeout=5)
+    queue.close(timeout=5)
+    assert len(queue._status) == len(queue._keys) == len(queue._ticket_keys) == 3
+    assert queue.status(tickets[0]) == (FAILED, 'Unknown submission.')
+    assert queue.status(tickets[-1]) == (WRITTEN, '')